@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+CACHE_DIR = os.environ.get(
+    "SAMPLELAB_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".samplelab", "analysis_cache")
+)
+MAX_CACHE_BYTES = int(os.environ.get("SAMPLELAB_CACHE_BYTES", 512 * 1024 * 1024))
+
+# Results hold key and tempo plus arrays (beats, chroma, times, transients, ...)
+SCALAR_FIELDS = ("key", "tempo")
+
+
+def audio_hash(y, sr):
+    # Content hash of the decoded samples, independent of file name or container
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str(int(sr)).encode())
+    h.update(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    # Content hash of the file's bytes, for audio too long to decode just to hash it
+    h = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(content_hash, params):
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(f"{content_hash}:{blob}".encode()).hexdigest()
+
+
+class AnalysisCache:
+    """SQLite index plus one .npz blob per (audio hash, parameters) entry.
+
+    Entries are evicted least-recently-used once the blobs exceed
+    ``max_bytes``. A second table maps (path, size, mtime) to the audio
+    hash so a known, unchanged file can be looked up without decoding it.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"),
+                                   timeout=30, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, audio_hash TEXT, params TEXT,"
+                " size INTEGER, created REAL, last_access REAL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT, size INTEGER, mtime_ns INTEGER, decode TEXT,"
+                " audio_hash TEXT, PRIMARY KEY (path, decode))"
+            )
+
+    def _blob_path(self, key):
+        return os.path.join(self.cache_dir, "blobs", f"{key}.npz")
+
+    # --- Results ---
+    def get(self, content_hash, params):
+        key = cache_key(content_hash, params)
+        with self._lock:
+            row = self._db.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with np.load(self._blob_path(key), allow_pickle=False) as data:
+                result = {name: data[name] for name in data.files}
+                result["key"] = str(data["key"])
+                result["tempo"] = float(data["tempo"])
+        except (OSError, KeyError, ValueError):
+            self._delete(key)
+            return None
+        with self._lock, self._db:
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return result
+
+    def put(self, content_hash, params, result):
+        key = cache_key(content_hash, params)
+        path = self._blob_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        arrays = {name: np.asarray(value) for name, value in result.items()
+                  if name not in SCALAR_FIELDS}
+        with open(tmp_path, "wb") as f:
+            np.savez(f, key=np.array(str(result["key"])),
+                     tempo=np.array(float(result["tempo"])), **arrays)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content_hash, json.dumps(params, sort_keys=True, default=str),
+                 os.path.getsize(path), now, now)
+            )
+        self._evict()
+
+    def _delete(self, key):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(self._blob_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._delete(key)
+            total -= size
+
+    # --- File index ---
+    def lookup_file(self, file_path, decode):
+        # Audio hash of an unchanged file, or None if it must be decoded again
+        stat = os.stat(file_path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT audio_hash FROM files WHERE path = ? AND decode = ?"
+                " AND size = ? AND mtime_ns = ?",
+                (os.path.abspath(file_path), json.dumps(decode, sort_keys=True),
+                 stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        return row[0] if row else None
+
+    def remember_file(self, file_path, decode, content_hash):
+        stat = os.stat(file_path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+                 json.dumps(decode, sort_keys=True), content_hash)
+            )
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache():
+    # Process-wide cache shared by the GUI and process_audio
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = AnalysisCache()
+        return _CACHE
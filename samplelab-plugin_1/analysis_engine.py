@@ -0,0 +1,179 @@
+import os
+import threading
+from collections import OrderedDict
+
+import librosa
+import numpy as np
+
+from audio_source import open_source
+from key_detection import detect_key
+from profiling import span
+
+# STFT settings shared by HPSS, the onset envelope and beat tracking
+N_FFT = 2048
+HOP_LENGTH = 512
+
+
+class FeatureGraph:
+    """Per-file analysis state where every intermediate is computed once.
+
+    The STFT feeds HPSS and the onset envelope, the onset envelope feeds
+    tempo, beats and transients, and the CQT feeds chroma. Each node is
+    memoized by its parameters so callers can ask for the same feature
+    repeatedly without paying for it twice.
+    """
+
+    def __init__(self, y, sr):
+        self.y = y
+        self.sr = sr
+        self._memo = {}
+
+    def _cached(self, key, compute):
+        if key not in self._memo:
+            with span(key[0]):
+                self._memo[key] = compute()
+        return self._memo[key]
+
+    # --- Spectral front end ---
+    def stft(self):
+        return self._cached(
+            ("stft",),
+            lambda: librosa.stft(self.y, n_fft=N_FFT, hop_length=HOP_LENGTH)
+        )
+
+    def hpss(self, margin):
+        # One median-filter pass yields both the harmonic and percussive masks
+        def compute():
+            D_harm, D_perc = librosa.decompose.hpss(self.stft(), margin=margin)
+            y_harm = librosa.istft(D_harm, dtype=self.y.dtype, n_fft=N_FFT,
+                                   hop_length=HOP_LENGTH, length=len(self.y))
+            y_perc = librosa.istft(D_perc, dtype=self.y.dtype, n_fft=N_FFT,
+                                   hop_length=HOP_LENGTH, length=len(self.y))
+            return y_harm, y_perc
+        return self._cached(("hpss", float(margin)), compute)
+
+    def harmonic(self, margin):
+        return self.hpss(margin)[0]
+
+    def percussive(self, margin):
+        return self.hpss(margin)[1]
+
+    def log_mel(self):
+        def compute():
+            mel = librosa.feature.melspectrogram(S=np.abs(self.stft()) ** 2, sr=self.sr)
+            return librosa.power_to_db(mel)
+        return self._cached(("log_mel",), compute)
+
+    def onset_envelope(self):
+        return self._cached(
+            ("onset_envelope",),
+            lambda: librosa.onset.onset_strength(S=self.log_mel(), sr=self.sr)
+        )
+
+    def mfcc(self, n_mfcc=13):
+        return self._cached(
+            ("mfcc", n_mfcc),
+            lambda: librosa.feature.mfcc(S=self.log_mel(), sr=self.sr, n_mfcc=n_mfcc)
+        )
+
+    # --- Rhythm ---
+    def tempo(self, start_bpm=120):
+        def compute():
+            try:
+                tempo = librosa.feature.rhythm.tempo(onset_envelope=self.onset_envelope(),
+                                                     sr=self.sr, start_bpm=start_bpm)
+            except AttributeError:
+                tempo = librosa.beat.tempo(onset_envelope=self.onset_envelope(),
+                                           sr=self.sr, start_bpm=start_bpm)
+            return float(tempo[0])
+        return self._cached(("tempo", start_bpm), compute)
+
+    def beats(self, tightness=100, start_bpm=120):
+        # Beat tracking reuses the tempo estimate instead of recomputing it
+        def compute():
+            _, beat_frames = librosa.beat.beat_track(
+                onset_envelope=self.onset_envelope(), sr=self.sr,
+                hop_length=HOP_LENGTH, bpm=self.tempo(start_bpm), tightness=tightness
+            )
+            return librosa.frames_to_time(beat_frames, sr=self.sr, hop_length=HOP_LENGTH)
+        return self._cached(("beats", tightness, start_bpm), compute)
+
+    def transients(self, distance=32, prominence=0.5):
+        def compute():
+            from scipy.signal import find_peaks
+            peaks = find_peaks(self.onset_envelope(), distance=distance, prominence=prominence)[0]
+            return librosa.frames_to_time(peaks, sr=self.sr, hop_length=HOP_LENGTH)
+        return self._cached(("transients", distance, prominence), compute)
+
+    # --- Harmony ---
+    def tuning(self, margin):
+        return self._cached(
+            ("tuning", float(margin)),
+            lambda: float(librosa.pitch_tuning(self.harmonic(margin)))
+        )
+
+    def cqt(self, margin, hop_length=512, n_octaves=7, bins_per_octave=36, tuning=None):
+        def compute():
+            return np.abs(librosa.cqt(
+                self.harmonic(margin), sr=self.sr, hop_length=hop_length,
+                n_bins=n_octaves * bins_per_octave, bins_per_octave=bins_per_octave,
+                tuning=tuning
+            ))
+        return self._cached(("cqt", float(margin), hop_length, n_octaves, bins_per_octave, tuning), compute)
+
+    def chroma(self, margin, hop_length=512, n_octaves=7, bins_per_octave=36,
+               tuning=None, threshold=0.0):
+        def compute():
+            C = self.cqt(margin, hop_length, n_octaves, bins_per_octave, tuning)
+            return librosa.feature.chroma_cqt(
+                C=C, sr=self.sr, hop_length=hop_length, n_chroma=12,
+                n_octaves=n_octaves, bins_per_octave=bins_per_octave,
+                threshold=threshold
+            )
+        return self._cached(
+            ("chroma", float(margin), hop_length, n_octaves, bins_per_octave, tuning, threshold),
+            compute
+        )
+
+    def chroma_stft(self):
+        # Cheap chroma straight from the shared STFT, with no HPSS, CQT or tuning pass
+        return self._cached(
+            ("chroma_stft",),
+            lambda: librosa.feature.chroma_stft(S=np.abs(self.stft()) ** 2, sr=self.sr,
+                                                n_fft=N_FFT, hop_length=HOP_LENGTH, tuning=0.0)
+        )
+
+
+def estimate_key(chroma, min_strength=0.45):
+    # Best of the 24 major/minor key profiles for the mean chroma
+    return detect_key(np.mean(chroma, axis=1), min_strength)[0]
+
+
+# Recently used graphs, so reopening a file reuses its intermediates
+_GRAPHS = OrderedDict()
+_MAX_GRAPHS = 2
+_GRAPHS_LOCK = threading.Lock()
+
+
+def load_graph(file_path, sr=22050, mono=True, duration=None):
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, sr, mono, duration)
+    with _GRAPHS_LOCK:
+        graph = _GRAPHS.get(key)
+        if graph is not None:
+            _GRAPHS.move_to_end(key)
+            return graph
+
+    # Decode outside the lock so other threads can load other files
+    y, sr = open_source(file_path).load(sr=sr, mono=mono, duration=duration)
+    graph = FeatureGraph(y, sr)
+    with _GRAPHS_LOCK:
+        _GRAPHS[key] = graph
+        while len(_GRAPHS) > _MAX_GRAPHS:
+            _GRAPHS.popitem(last=False)
+    return graph
+
+
+def clear_graphs():
+    with _GRAPHS_LOCK:
+        _GRAPHS.clear()
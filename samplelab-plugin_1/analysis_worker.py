@@ -0,0 +1,64 @@
+import queue
+import threading
+
+
+class AnalysisCancelled(Exception):
+    pass
+
+
+class AnalysisJob:
+    """Runs a staged analysis generator on a background thread.
+
+    ``stages`` is a callable returning an iterator of
+    ``(stage_name, progress, values)`` tuples. Each tuple is handed to the
+    Tk thread through a queue that the GUI drains from ``root.after``
+    callbacks, so nothing here touches Tk. Cancellation is checked between
+    stages; a cancelled job drops whatever it produces afterwards.
+    """
+
+    def __init__(self, stages):
+        self._stages = stages
+        self._queue = queue.Queue()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self.done = False
+        self.error = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _run(self):
+        try:
+            for stage in self._stages():
+                if self._cancel.is_set():
+                    raise AnalysisCancelled()
+                self._queue.put(stage)
+        except AnalysisCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self._queue.put(None)
+
+    def drain(self):
+        # Stages finished since the last call; never blocks
+        stages = []
+        while True:
+            try:
+                stage = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if stage is None:
+                self.done = True
+                break
+            if not self._cancel.is_set():
+                stages.append(stage)
+        return stages
@@ -1,13 +1,27 @@
+import os
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog
-import librosa
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import midiutil
-import matplotlib.pyplot as plt
 import warnings
-import soundfile as sf
+from analysis_engine import load_graph
+from analysis_worker import AnalysisJob
+from audio_source import open_source
+from audition import PAD_KEYS, AuditionEngine, default_sink
+import profiling
+import quality
+import warmup
+from chop_export import chop_ranges, export_chops, export_file_chops
+from midi_export import export_chord_midi
+from onset_index import OnsetIndex
+from profiling import profiled, span
+from visuals import chroma_bin_means
+from similarity import INDEX_DIR, SimilarityIndex
+from timeline_plot import TimelinePlot
+from viewport import Viewport
+from waveform_peaks import load_or_build
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -36,21 +50,59 @@ class SampleLabPro:
         
         self.chord_labels = ['C', 'C#', 'D', 'D#', 'E', 'F', 
                             'F#', 'G', 'G#', 'A', 'A#', 'B']
-        self.max_display_time = 10
+        self.max_display_time = 10  # Initial span of the viewport
+        self.viewport = Viewport(span=self.max_display_time)
         self.sr = 22050
+        self.analysis_tier = tk.StringVar(value='standard')
         self.audio_data = None
+        self.peaks = None
         self.chroma = None
+        self.chroma_bins = None
+        self.chroma_bin_size = 0.5
+        self.chroma_threshold = tk.DoubleVar(value=0.6)
         self.times = []
         self.key = "N/A"
         self.tempo = 0.0  # Store as float
         self.beats = np.array([])  # Initialize as numpy array
+        self.transients = np.array([])
+        self.onset_index = None
         self.chop_points = []
+        self.dragged_chop = None
+        self.audition = None
+        self.pad_bank = 0
+        self.refresh_pads = None
+        self.analysis_job = None
+        self.poll_interval_ms = 50
+        self.file_path = None
+        self.index_dir = INDEX_DIR
+        self.similarity_index = None
+        self.similar_job = None
+        self.export_job = None
+        self.live_session = None
+        self.live_span = 10  # Seconds of live input on screen
+        self.live_frame_ms = 40
+        self.profile_var = tk.BooleanVar(value=profiling.is_enabled())
+        self.analysis_started = None
+        self.warmup_timings = None
+        self.export_bit_depth = tk.StringVar(value='Source')
         self.selected_artist = tk.StringVar(value='Kanye West')
         self.show_chops_var = tk.BooleanVar(value=True)
+        self.snap_var = tk.BooleanVar(value=True)
 
         self.create_header()
         self.create_main_display()
         self.create_control_panel()
+        self.root.bind('<Key>', self.on_pad_key)
+        
+        # Librosa's kernels compile in the background once the window is up
+        self.root.after_idle(self.start_warmup)
+
+    def start_warmup(self):
+        warmup.start_background(on_done=self.finish_warmup)
+
+    def finish_warmup(self, timings):
+        # Called on the warm-up thread; only stores, the Debug window reads it
+        self.warmup_timings = timings
 
     def create_header(self):
         header_frame = ttk.Frame(self.root, padding=10)
@@ -60,6 +112,33 @@ class SampleLabPro:
                                    command=self.load_sample)
         self.upload_btn.pack(side=tk.LEFT, padx=20)
         
+        ttk.Button(header_frame, text="Find Similar",
+                   command=self.find_similar).pack(side=tk.LEFT, padx=5)
+        
+        self.live_btn = ttk.Button(header_frame, text="Live",
+                                   command=self.toggle_live)
+        self.live_btn.pack(side=tk.LEFT, padx=5)
+        
+        ttk.Checkbutton(header_frame, text="Profile", variable=self.profile_var,
+                        command=self.toggle_profiling).pack(side=tk.LEFT, padx=5)
+        ttk.Button(header_frame, text="Debug",
+                   command=self.show_profile).pack(side=tk.LEFT, padx=5)
+        
+        # Background analysis progress
+        progress_frame = ttk.Frame(header_frame)
+        progress_frame.pack(side=tk.RIGHT, padx=20)
+        
+        self.progress = ttk.Progressbar(progress_frame, length=180, maximum=1.0,
+                                        mode='determinate')
+        self.progress.pack(side=tk.LEFT, padx=5)
+        
+        self.cancel_btn = ttk.Button(progress_frame, text="Cancel",
+                                     command=self.cancel_analysis, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.status_label = ttk.Label(progress_frame, text="", width=28)
+        self.status_label.pack(side=tk.LEFT, padx=5)
+        
         analysis_frame = ttk.Frame(header_frame)
         analysis_frame.pack(side=tk.LEFT, padx=40)
         
@@ -100,13 +179,27 @@ class SampleLabPro:
         self.chord_fig.subplots_adjust(left=0.05, right=0.95, bottom=0.15, top=0.95)
         self.chord_canvas = FigureCanvasTkAgg(self.chord_fig, master=chord_frame)
         self.chord_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.timeline = TimelinePlot(self.ax, self.chord_ax, self.colors, self.chord_labels)
+        
+        # Timeline navigation: wheel zooms around the cursor, shift+wheel scrolls
+        self.scrollbar = ttk.Scrollbar(main_frame, orient=tk.HORIZONTAL, command=self.on_scrollbar)
+        self.scrollbar.pack(fill=tk.X)
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.chord_canvas.mpl_connect('scroll_event', self.on_scroll)
+        
+        # Chop markers can be dragged; they snap to transients while moving
+        self.canvas.mpl_connect('button_press_event', self.on_chop_press)
+        self.canvas.mpl_connect('motion_notify_event', self.on_chop_drag)
+        self.canvas.mpl_connect('button_release_event', self.on_chop_release)
 
     def create_control_panel(self):
         control_frame = ttk.Frame(self.root, padding=10)
         control_frame.pack(fill=tk.X, padx=15, pady=10)
         
         ttk.Button(control_frame, text="Export MIDI", command=self.export_midi).pack(side=tk.LEFT, padx=20)
-        ttk.Button(control_frame, text="Export WAV", command=self.export_wav).pack(side=tk.LEFT, padx=20)
+        ttk.Button(control_frame, text="Export WAV", command=self.export_wav).pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Combobox(control_frame, textvariable=self.export_bit_depth,
+                     values=['Source', '16', '24', '32'], width=6, state='readonly').pack(side=tk.LEFT, padx=(0, 20))
         
         ttk.Label(control_frame, text="Artist Style:").pack(side=tk.LEFT, padx=5)
         artist_menu = ttk.Combobox(control_frame, textvariable=self.selected_artist,
@@ -118,144 +211,572 @@ class SampleLabPro:
         
         ttk.Checkbutton(control_frame, text="Show Chops", 
                        variable=self.show_chops_var,
-                       command=self.update_visualizations).pack(side=tk.LEFT)
+                       command=self.update_chops).pack(side=tk.LEFT)
+        ttk.Checkbutton(control_frame, text="Snap", 
+                       variable=self.snap_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(control_frame, text="Pads",
+                  command=self.show_pads).pack(side=tk.LEFT, padx=5)
+        
+        ttk.Button(control_frame, text="Zoom In",
+                  command=lambda: self.zoom_view(0.5)).pack(side=tk.LEFT, padx=(20, 2))
+        ttk.Button(control_frame, text="Zoom Out",
+                  command=lambda: self.zoom_view(2.0)).pack(side=tk.LEFT, padx=2)
+        ttk.Button(control_frame, text="Fit",
+                  command=self.fit_view).pack(side=tk.LEFT, padx=2)
+        
+        ttk.Label(control_frame, text="Quality:").pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Combobox(control_frame, textvariable=self.analysis_tier, values=quality.TIER_NAMES[1:],
+                     width=9, state='readonly').pack(side=tk.LEFT, padx=5)
+        
+        ttk.Label(control_frame, text="Chord Threshold:").pack(side=tk.LEFT, padx=(20, 5))
+        ttk.Scale(control_frame, from_=0.0, to=1.0, variable=self.chroma_threshold,
+                  command=self.update_chroma_threshold).pack(side=tk.LEFT, padx=5)
 
     def load_sample(self):
         file_path = filedialog.askopenfilename(filetypes=[("Audio Files", "*.wav *.mp3")])
         if file_path:
-            self.analyze_audio(file_path)
+            self.start_analysis(file_path)
+
+    def start_analysis(self, file_path):
+        # A new file supersedes whatever is still being analyzed
+        self.stop_live()
+        self.cancel_analysis()
+        self.reset_analysis()
+        self.file_path = file_path
+        # Each analysis gets its own profile
+        profiling.clear()
+        self.analysis_started = time.perf_counter()
+        self.analysis_job = AnalysisJob(lambda: self.analysis_stages(file_path)).start()
+        self.progress['value'] = 0
+        self.cancel_btn.state(['!disabled'])
+        self.status_label.config(text=f"Analyzing {os.path.basename(file_path)}...")
+        self.root.after(self.poll_interval_ms, self.poll_analysis, self.analysis_job)
+
+    def poll_analysis(self, job):
+        if job is not self.analysis_job:
+            return
+        for stage, progress, values in job.drain():
+            self.apply_stage(values)
+            self.progress['value'] = progress
             self.update_visualizations()
+        if not job.done:
+            self.root.after(self.poll_interval_ms, self.poll_analysis, job)
+            return
+        self.analysis_job = None
+        self.cancel_btn.state(['disabled'])
+        if job.error is not None:
+            print(f"Analysis error: {str(job.error)}")
+            self.status_label.config(text="Analysis failed")
+        else:
+            elapsed = time.perf_counter() - self.analysis_started
+            self.status_label.config(text=f"Done in {elapsed:.2f} s")
+
+    def cancel_analysis(self):
+        if self.analysis_job is not None:
+            self.analysis_job.cancel()
+            self.analysis_job = None
+            self.cancel_btn.state(['disabled'])
+            self.progress['value'] = 0
+            self.status_label.config(text="Cancelled")
+
+    def reset_analysis(self):
+        self.audio_data = None
+        self.peaks = None
+        self.chroma = None
+        self.chroma_bins = None
+        self.times = []
+        self.key = "N/A"
+        self.tempo = 0.0
+        self.beats = np.array([])
+        self.transients = np.array([])
+        self.onset_index = None
+        self.chop_points = []
+        self.dragged_chop = None
+        self.pad_bank = 0
+        self.load_audition()
 
     def analyze_audio(self, file_path):
-        y, sr = librosa.load(file_path, sr=self.sr)
-        self.audio_data = y
-        
-        # Improved tempo detection with array handling
-        try:
-            self.tempo = float(librosa.feature.rhythm.tempo(y=y, sr=sr)[0])
-        except AttributeError:
-            self.tempo = float(librosa.beat.tempo(y=y, sr=sr)[0])
-        
-        # Get beat frames as numpy array
-        _, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-        self.beats = librosa.frames_to_time(beat_frames, sr=sr)
-        
-        # Chroma analysis
-        y_harmonic = librosa.effects.harmonic(y, margin=4)
-        self.chroma = librosa.feature.chroma_cqt(
-            y=y_harmonic,
-            sr=sr,
-            n_chroma=12,
-            hop_length=2048,
-            n_octaves=6
-        )
-        
-        # Limit to 10 seconds
-        target_frames = int(10 * sr / 2048)
-        self.chroma = self.chroma[:, :target_frames]
-        self.times = librosa.frames_to_time(np.arange(self.chroma.shape[1]), sr=sr, hop_length=2048)
-        
-        # Key detection
-        chroma_avg = np.mean(self.chroma, axis=1)
-        self.key = self.chord_labels[np.argmax(chroma_avg)]
+        # Blocking variant of the staged analysis
+        for stage, progress, values in self.analysis_stages(file_path):
+            self.apply_stage(values)
+
+    def apply_stage(self, values):
+        for name, value in values.items():
+            setattr(self, name, value)
+        if 'audio_data' in values:
+            self.viewport.set_duration(len(self.audio_data) / self.sr, span=self.max_display_time)
 
+    def analysis_stages(self, file_path):
+        # Yields (stage, progress, values): a quick key and tempo from the preview
+        # tier, the waveform, then rhythm and harmony at the selected tier
+        # Spans close before each yield so time spent in the GUI is not counted
+        tier = self.analysis_tier.get()
+        with span('preview'):
+            preview = quality.analyze(file_path, 'preview')
+        yield 'preview', 0.1, {'key': preview['key'], 'tempo': preview['tempo']}
+        
+        with span('waveform'):
+            display = load_graph(file_path, sr=self.sr)
+            with span('peaks'):
+                peaks = load_or_build(file_path, display.y, display.sr)
+        yield 'waveform', 0.3, {'audio_data': display.y, 'peaks': peaks}
+        
+        # Reuse a previous analysis of the same audio at the same tier
+        with span('cache_lookup', tier=tier):
+            result = quality.cached_result(file_path, tier)
+            if result is None:
+                graph = quality.load_tier_graph(file_path, tier)
+                result = quality.cached_result(file_path, tier, graph)
+        if result is not None:
+            rhythm = {name: result[name] for name in ('tempo', 'beats', 'transients')}
+            harmony = {name: result[name] for name in ('chroma', 'times', 'key')}
+        else:
+            with span('rhythm', tier=tier):
+                rhythm = quality.rhythm(graph, tier)
+        with span('onset_index'):
+            onset_index = OnsetIndex.from_audio(display.y, display.sr, rhythm['transients'])
+        yield 'rhythm', 0.6, dict(rhythm, onset_index=onset_index)
+        if result is None:
+            with span('harmony', tier=tier):
+                harmony = quality.harmony(graph, tier)
+            with span('cache_store'):
+                quality.store_result(file_path, tier, graph, dict(rhythm, **harmony))
+        
+        # Display bins are reduced here so redraws only have to draw them
+        with span('chroma_bins'):
+            harmony['chroma_bins'] = chroma_bin_means(harmony['chroma'], harmony['times'],
+                                                      self.chroma_bin_size, len(display.y) / display.sr)
+        yield 'harmony', 1.0, harmony
+
+    @profiled('redraw')
     def update_visualizations(self):
-        self.ax.clear()
-        self.chord_ax.clear()
-        
-        # Waveform plot
-        display_samples = min(len(self.audio_data), 10 * self.sr)
-        time_axis = np.linspace(0, 10, display_samples)
-        self.ax.plot(time_axis, self.audio_data[:display_samples], color=self.colors['active'])
-        self.ax.set_ylim(-0.4, 0.2)
-        self.ax.set_xlim(0, 10)
-        self.ax.set_xticks(np.arange(0, 11, 1))
-        self.ax.grid(color=self.colors['grid'], alpha=0.3, linestyle=':')
-        
-        # Draw artist-specific chop lines
-        if self.show_chops_var.get() and self.chop_points:
-            style = self.artist_presets[self.selected_artist.get()]
-            for chop in self.chop_points:
-                if chop <= 10:
-                    self.ax.axvline(x=chop, color=style['color'], 
-                                   linestyle=style['linestyle'], alpha=0.8)
+        self.update_labels()
+        if self.audio_data is None:
+            return
         
-        # Chord visualization
-        bin_width = 0.8
-        for i in range(12):
-            for t in np.arange(0, 10, 0.5):
-                mask = (self.times >= t) & (self.times < t+0.5)
-                if np.any(mask):
-                    valid_indices = np.where(mask)[0]
-                    if valid_indices[-1] >= self.chroma.shape[1]:
-                        valid_indices = valid_indices[valid_indices < self.chroma.shape[1]]
-                    segment = self.chroma[i, valid_indices]
-                    intensity = np.mean(segment)
-                    color = self.colors['active'] if intensity > 0.6 else self.colors['inactive']
-                    
-                    self.chord_ax.add_patch(
-                        plt.Rectangle(
-                            (t, i - bin_width/2),
-                            width=0.5,
-                            height=bin_width,
-                            facecolor=color,
-                            edgecolor=self.colors['background'],
-                            linewidth=0.5
-                        )
-                    )
-        
-        # Axis configuration
-        self.chord_ax.set_yticks(np.arange(12))
-        self.chord_ax.set_yticklabels(reversed(self.chord_labels))
-        self.chord_ax.set_xticks(np.arange(0, 11, 1))
-        self.chord_ax.set_xlim(0, 10)
-        self.chord_ax.set_ylim(-0.5, 11.5)
-        self.chord_ax.grid(color=self.colors['grid'], alpha=0.3)
-        
-        # Update labels
+        self.set_chop_markers()
+        self.render_view()
+        self.canvas.draw_idle()
+        self.chord_canvas.draw_idle()
+
+    def set_chop_markers(self):
+        style = self.artist_presets[self.selected_artist.get()]
+        self.timeline.set_chops(self.chop_points, style['color'], style['linestyle'],
+                                visible=self.show_chops_var.get())
+
+    def update_chops(self):
+        # Chop changes only re-blit the markers over the cached waveform
+        if self.audio_data is None:
+            return
+        self.set_chop_markers()
+        self.timeline.blit_chops()
+        self.load_audition()
+
+    def update_labels(self):
         self.key_label.config(text=f"Key: {self.key}")
-        self.tempo_label.config(text=f"Tempo: {int(round(self.tempo))} BPM")
+        tempo_text = int(round(self.tempo)) if self.tempo else '-'
+        self.tempo_label.config(text=f"Tempo: {tempo_text} BPM")
+
+    def render_view(self):
+        # Updates the persistent artists to what falls inside the viewport
+        start, end = self.viewport.bounds
+        
+        # Waveform plot: one min/max column per pixel from the peak pyramid
+        n_pixels = int(self.ax.get_window_extent().width)
+        self.timeline.set_waveform(*self.peaks.window(start, end, n_pixels))
         
-        self.canvas.draw()
-        self.chord_canvas.draw()
+        # Chord visualization (available once the harmony stage is done)
+        first = int(start // self.chroma_bin_size)
+        last = 0 if self.chroma_bins is None else min(int(np.ceil(end / self.chroma_bin_size)),
+                                                      self.chroma_bins.shape[1])
+        self.timeline.set_chroma(self.chroma_bins, self.chroma_bin_size, first, last,
+                                 self.chroma_threshold.get())
+        
+        self.timeline.set_view(start, end)
+        self.scrollbar.set(*self.viewport.fractions())
+
+    def view_changed(self):
+        if self.audio_data is None:
+            return
+        self.render_view()
+        self.canvas.draw_idle()
+        self.chord_canvas.draw_idle()
+
+    def zoom_view(self, factor, anchor=None):
+        self.viewport.zoom(factor, anchor)
+        self.view_changed()
+
+    def fit_view(self):
+        self.viewport.fit()
+        self.view_changed()
+
+    def on_scroll(self, event):
+        if event.xdata is None:
+            return
+        if event.key and 'shift' in event.key:
+            direction = -1 if event.button == 'up' else 1
+            self.viewport.scroll(direction * 0.1 * self.viewport.span)
+            self.view_changed()
+        else:
+            self.zoom_view(0.8 if event.button == 'up' else 1.25, anchor=event.xdata)
+
+    def on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.viewport.scroll_to(float(args[1]) * self.viewport.duration)
+        elif args[0] == 'scroll':
+            step = self.viewport.span if args[2] == 'pages' else 0.1 * self.viewport.span
+            self.viewport.scroll(int(args[1]) * step)
+        self.view_changed()
+
+    def update_chroma_threshold(self, *args):
+        # Re-threshold the existing grid without rebuilding it
+        if self.timeline.set_threshold(self.chroma_bins, self.chroma_threshold.get()):
+            self.chord_canvas.draw_idle()
+
+    def toggle_live(self):
+        if self.live_session is not None:
+            self.stop_live()
+            return
+        # Imported here: live_input pulls in librosa, which the window defers
+        from live_input import FileSource, LiveSession, default_source
+        source = default_source()
+        if source is None:
+            # No sound card input: play a file in real time instead
+            file_path = filedialog.askopenfilename(filetypes=[("Audio Files", "*.wav *.flac *.ogg")])
+            if not file_path:
+                return
+            source = FileSource(file_path, realtime=True)
+        self.cancel_analysis()
+        self.reset_analysis()
+        self.file_path = None
+        self.live_session = LiveSession(source).start()
+        self.live_btn.config(text="Stop Live")
+        self.status_label.config(text="Listening...")
+        self.root.after(self.live_frame_ms, self.poll_live, self.live_session)
+
+    def stop_live(self):
+        if self.live_session is not None:
+            self.live_session.stop()
+            self.live_session = None
+            self.live_btn.config(text="Live")
+            self.status_label.config(text="Live input stopped")
+
+    def poll_live(self, session):
+        # One frame of the live view; frames are scheduled at a fixed rate no
+        # matter how long drawing took, and only the newest state is drawn
+        if session is not self.live_session:
+            return
+        started = time.perf_counter()
+        analyzer = session.analyzer
+        self.key, self.tempo = analyzer.key, analyzer.tempo
+        self.update_labels()
+        
+        now = session.time
+        start = now - self.live_span
+        n_pixels = int(self.ax.get_window_extent().width)
+        self.timeline.set_waveform(*session.waveform(self.live_span, n_pixels))
+        
+        # Bins are counted from 0 s of input, so they stay put as the view scrolls
+        chroma, times = analyzer.chroma_window(self.live_span)
+        first = max(int(start // self.chroma_bin_size), 0)
+        t0 = first * self.chroma_bin_size
+        self.chroma_bins = chroma_bin_means(chroma, times - t0, self.chroma_bin_size, now - t0)
+        self.timeline.set_chroma(self.chroma_bins, self.chroma_bin_size, 0,
+                                 self.chroma_bins.shape[1], self.chroma_threshold.get(),
+                                 offset=first)
+        self.timeline.set_view(start, now)
+        self.canvas.draw_idle()
+        self.chord_canvas.draw_idle()
+        
+        stats = session.stats
+        self.status_label.config(text=f"Live {now:.1f} s, {stats['last_ms']:.1f} ms/block")
+        if session.finished.is_set():
+            self.live_session = None
+            self.live_btn.config(text="Live")
+            self.status_label.config(text="Live input ended")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.root.after(max(int(self.live_frame_ms - elapsed_ms), 1), self.poll_live, session)
+
+    def find_similar(self, k=10):
+        if self.file_path is None:
+            self.status_label.config(text="Load a sample first")
+            return
+        if self.similarity_index is None:
+            try:
+                self.similarity_index = SimilarityIndex(self.index_dir)
+            except (OSError, ValueError) as e:
+                print(f"Similarity index error: {str(e)}")
+                self.status_label.config(text="No sample index - run samplelab index")
+                return
+        if self.similar_job is not None:
+            self.similar_job.cancel()
+        index, file_path = self.similarity_index, self.file_path
+        # Usually instant; only a file missing from the index needs analysis
+        self.similar_job = AnalysisJob(
+            lambda: [('similar', 1.0, {'matches': index.similar_to(file_path, k=k)})]).start()
+        self.status_label.config(text="Searching...")
+        self.root.after(self.poll_interval_ms, self.poll_similar, self.similar_job)
+
+    def poll_similar(self, job):
+        if job is not self.similar_job:
+            return
+        stages = job.drain()
+        if not job.done:
+            self.root.after(self.poll_interval_ms, self.poll_similar, job)
+            return
+        self.similar_job = None
+        if job.error is not None:
+            print(f"Similarity search error: {str(job.error)}")
+            self.status_label.config(text="Search failed")
+            return
+        self.status_label.config(text="Done")
+        self.show_similar(stages[0][2]['matches'] if stages else [])
+
+    def show_similar(self, matches):
+        window = tk.Toplevel(self.root)
+        window.title(f"Similar to {os.path.basename(self.file_path)}")
+        listbox = tk.Listbox(window, width=80, height=max(len(matches), 1),
+                             bg=self.colors['background'], fg=self.colors['text'])
+        listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        for path, score in matches:
+            listbox.insert(tk.END, f"{score:5.2f}  {path}")
+        if not matches:
+            listbox.insert(tk.END, "No similar samples in the index")
+
+        def open_selected(event):
+            selection = listbox.curselection()
+            if selection and selection[0] < len(matches):
+                self.start_analysis(matches[selection[0]][0])
+        listbox.bind('<Double-Button-1>', open_selected)
+
+    def toggle_profiling(self):
+        if self.profile_var.get():
+            profiling.enable()
+        else:
+            profiling.disable()
+
+    def show_profile(self):
+        window = tk.Toplevel(self.root)
+        window.title("Profile")
+        text = tk.Text(window, width=64, height=24, font=('Courier', 10),
+                       bg=self.colors['background'], fg=self.colors['text'])
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        if profiling.records():
+            text.insert(tk.END, profiling.format_summary())
+        else:
+            text.insert(tk.END, "No spans recorded. Tick Profile and analyze a sample.")
+        if self.warmup_timings is not None:
+            text.insert(tk.END, "\n\nWarm-up: " + ", ".join(
+                f"{stage} {value:.2f} s" if isinstance(value, float) else f"{stage} {value}"
+                for stage, value in self.warmup_timings.items()))
+        if self.audition is not None:
+            stats = self.audition.stats
+            text.insert(tk.END, f"\n\nAudition: latency {stats['latency_ms']:.1f} ms "
+                                f"(max {stats['max_latency_ms']:.1f}), callback max "
+                                f"{stats['max_ms']:.2f} ms, {self.audition.underruns} underruns")
+        text.config(state=tk.DISABLED)
+        ttk.Button(window, text="Export Trace",
+                   command=self.export_trace).pack(pady=(0, 10))
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(defaultextension=".json",
+                                            filetypes=[("Chrome Trace", "*.json")])
+        if path:
+            count = profiling.export_chrome_trace(path)
+            self.status_label.config(text=f"Wrote {count} spans")
+
+    def ensure_audition(self):
+        # The output opens on first use; chops are resampled to its rate
+        if self.audition is None:
+            sink = default_sink()
+            if sink is None:
+                self.status_label.config(text="No audio output device")
+                return None
+            self.audition = AuditionEngine(sink).start()
+            self.load_audition()
+        return self.audition
+
+    def load_audition(self):
+        # Renders only chops that changed, so this is cheap during a drag.
+        # Chops come from the file at its own rate, a window at a time,
+        # rather than from the 22.05 kHz analysis buffer
+        if self.audition is not None:
+            source = None
+            if self.audio_data is not None and self.file_path is not None:
+                source = open_source(self.file_path)
+            self.audition.load(source, self.audition.sr, self.chop_points)
+        if self.refresh_pads is not None:
+            self.refresh_pads()
+
+    def chop_count(self):
+        # Chops the audition engine can play: zero-length ones are dropped
+        if self.audio_data is None:
+            return 0
+        if self.audition is not None:
+            return len(self.audition.bank)
+        return len(chop_ranges(self.chop_points, self.sr, len(self.audio_data)))
+
+    def play_chop(self, index):
+        audition = self.ensure_audition()
+        if audition is not None and not audition.trigger(index):
+            self.status_label.config(text=f"No chop {index + 1}")
+
+    def on_pad_key(self, event):
+        # Typing into a text field is not a pad hit
+        if event.widget.winfo_class() in ('TCombobox', 'TEntry', 'Entry', 'Text'):
+            return
+        key = (event.char or '').lower()
+        if key and key in PAD_KEYS:
+            self.play_chop(self.pad_bank * len(PAD_KEYS) + PAD_KEYS.index(key))
+
+    def show_pads(self):
+        window = tk.Toplevel(self.root)
+        window.title("Pads")
+        window.bind('<Key>', self.on_pad_key)
+        grid = ttk.Frame(window, padding=10)
+        grid.pack()
+        pads = []
+        for n in range(len(PAD_KEYS)):
+            pad = tk.Button(grid, width=6, height=3, bg=self.colors['inactive'],
+                            fg=self.colors['text'])
+            pad.grid(row=n // 4, column=n % 4, padx=3, pady=3)
+            # Fires on press rather than release, like a drum pad; bindings
+            # still fire on a disabled button, so empty pads check their state
+            pad.bind('<ButtonPress-1>',
+                     lambda event, n=n: str(event.widget['state']) != tk.DISABLED
+                     and self.play_chop(self.pad_bank * len(PAD_KEYS) + n))
+            pads.append(pad)
+        
+        nav = ttk.Frame(window)
+        nav.pack(pady=(0, 10))
+        bank_label = ttk.Label(nav, width=12, anchor=tk.CENTER)
+        
+        def n_banks():
+            return max(-(-self.chop_count() // len(PAD_KEYS)), 1)
+        
+        def refresh():
+            # Only chops that exist get a number; the other pads are disabled
+            self.pad_bank %= n_banks()
+            first = self.pad_bank * len(PAD_KEYS)
+            last = min(first + len(PAD_KEYS), self.chop_count())
+            bank_label.config(text=f"Chops {first + 1}-{last}" if last > first else "No chops")
+            for n, pad in enumerate(pads):
+                if first + n < last:
+                    pad.config(text=f"{first + n + 1}\n{PAD_KEYS[n].upper()}", state=tk.NORMAL)
+                else:
+                    pad.config(text="", state=tk.DISABLED)
+        
+        def switch_bank(step):
+            self.pad_bank = (self.pad_bank + step) % n_banks()
+            refresh()
+        
+        def closed(event):
+            if event.widget is window:
+                self.refresh_pads = None
+        
+        ttk.Button(nav, text="<", width=3, command=lambda: switch_bank(-1)).pack(side=tk.LEFT)
+        bank_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(nav, text=">", width=3, command=lambda: switch_bank(1)).pack(side=tk.LEFT)
+        window.bind('<Destroy>', closed)
+        self.refresh_pads = refresh
+        refresh()
+
+    def chop_near(self, event, tolerance_px=6):
+        # Index of the chop marker within tolerance_px of the mouse, or None
+        if not self.chop_points or not self.show_chops_var.get():
+            return None
+        i = int(np.searchsorted(self.chop_points, event.xdata))
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(self.chop_points)]
+        x = self.ax.transData.transform([(self.chop_points[j], 0) for j in candidates])[:, 0]
+        best = int(np.argmin(np.abs(x - event.x)))
+        return candidates[best] if abs(x[best] - event.x) <= tolerance_px else None
+
+    def on_chop_press(self, event):
+        if event.inaxes is self.ax and event.button == 1:
+            self.dragged_chop = self.chop_near(event)
+
+    def on_chop_drag(self, event):
+        if self.dragged_chop is None or event.xdata is None:
+            return
+        i = self.dragged_chop
+        t = event.xdata
+        if self.snap_var.get() and self.onset_index is not None:
+            # Reach scales with the zoom: about ten pixels either side
+            px = (self.viewport.span / max(self.ax.get_window_extent().width, 1))
+            t = float(self.onset_index.snap([t], max_shift=10 * px)[0])
+        # A marker stays at least a sample away from its neighbours, so the
+        # list stays sorted and no chop shrinks to nothing
+        lo = self.chop_points[i - 1] + 1 / self.sr if i > 0 else 0.0
+        hi = (self.chop_points[i + 1] - 1 / self.sr if i + 1 < len(self.chop_points)
+              else self.viewport.duration)
+        if lo > hi:
+            # Neighbours closer than two samples leave no room to move into
+            return
+        self.chop_points[i] = min(max(t, lo), hi)
+        self.update_chops()
+
+    def on_chop_release(self, event):
+        self.dragged_chop = None
 
     def generate_chops(self):
         if self.beats.size > 0:  # Proper numpy array check
             interval = self.artist_presets[self.selected_artist.get()]['chop_interval']
-            self.chop_points = self.beats[::interval].tolist()
-            self.update_visualizations()
+            chops = self.beats[::interval]
+            if self.snap_var.get() and self.onset_index is not None:
+                # Snapping can land two beats on one transient; keep it once
+                chops = np.unique(self.onset_index.snap(chops))
+            self.chop_points = chops.tolist()
+            self.update_chops()
         else:
             print("No beats detected - cannot generate chops")
 
     def export_midi(self):
         if self.chroma is not None:
-            midi = midiutil.MIDIFile(1)
-            midi.addTempo(0, 0, int(round(self.tempo)))
-            
-            chroma_thresh = librosa.util.normalize(self.chroma, axis=0)
-            for t_idx, t in enumerate(self.times):
-                if t_idx >= chroma_thresh.shape[1]:
-                    continue
-                for note_idx in range(12):
-                    if chroma_thresh[note_idx, t_idx] > 0.6:
-                        midi.addNote(0, 0, 60 + note_idx, t, 0.5, 100)
-            
-            with open("chord_export.mid", "wb") as f:
-                midi.writeFile(f)
+            export_chord_midi(self.chroma, self.times, self.tempo, "chord_export.mid",
+                              threshold=self.chroma_threshold.get())
 
     def export_wav(self):
-        if self.audio_data is not None and len(self.chop_points) > 1:
-            try:
-                base_path = filedialog.asksaveasfilename(defaultextension=".wav")
-                if base_path:
-                    for i, (start, end) in enumerate(zip(self.chop_points[:-1], self.chop_points[1:])):
-                        start_sample = int(start * self.sr)
-                        end_sample = int(end * self.sr)
-                        if 0 < start_sample < end_sample < len(self.audio_data):
-                            chop = self.audio_data[start_sample:end_sample]
-                            sf.write(f"{base_path}_chop_{i+1}.wav", chop, self.sr)
-            except Exception as e:
-                print(f"Export error: {str(e)}")
+        if self.audio_data is not None and len(self.chop_points) > 1 and self.export_job is None:
+            base_path = filedialog.asksaveasfilename(
+                defaultextension=".wav",
+                filetypes=[("WAV", "*.wav"), ("FLAC", "*.flac"), ("OGG Vorbis", "*.ogg")])
+            if not base_path:
+                return
+            base_path, ext = os.path.splitext(base_path)
+            y, sr, points, beats = self.audio_data, self.sr, list(self.chop_points), self.beats
+            fmt = (ext or ".wav")[1:].lower()
+            depth = self.export_bit_depth.get()
+            bit_depth = int(depth) if depth.isdigit() else None
+            source = self.file_path
+
+            def export():
+                # Cut from the original file at its native rate; the analysis
+                # buffer is only a fallback for files soundfile cannot seek
+                try:
+                    manifest = export_file_chops(source, points, base_path, fmt=fmt,
+                                                 bit_depth=bit_depth, beats=beats)
+                except RuntimeError:
+                    manifest = export_chops(y, sr, points, base_path, fmt=fmt,
+                                            bit_depth=bit_depth or 16, beats=beats)
+                yield 'export', 1.0, {'manifest': manifest}
+
+            # Encoding runs on a thread pool behind the job; Tk only polls for the result
+            self.export_job = AnalysisJob(export).start()
+            self.status_label.config(text="Exporting chops...")
+            self.root.after(self.poll_interval_ms, self.poll_export, self.export_job)
+
+    def poll_export(self, job):
+        job.drain()
+        if not job.done:
+            self.root.after(self.poll_interval_ms, self.poll_export, job)
+            return
+        self.export_job = None
+        if job.error is not None:
+            print(f"Export error: {str(job.error)}")
+            self.status_label.config(text="Export failed")
+        else:
+            self.status_label.config(text="Chops exported")
 
 if __name__ == "__main__":
     root = tk.Tk()
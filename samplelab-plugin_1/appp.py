@@ -1,13 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, filedialog
-import librosa
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import midiutil
-import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
 import warnings
-import soundfile as sf
+from midi_export import export_chord_midi
+import warmup
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -63,6 +62,8 @@ class SampleLabPro:
                             'F#', 'G', 'G#', 'A', 'A#', 'B']
         self.max_display_time = 10
         self.sr = 22050
+        self.analysis_params = {'sr': self.sr, 'hop_length': 2048, 'margin': 4,
+                                'n_octaves': 6, 'bins_per_octave': 36, 'max_time': 10}
         self.audio_data = None
         self.chroma = None
         self.times = []
@@ -169,32 +170,57 @@ class SampleLabPro:
             self.update_visualizations()
 
     def analyze_audio(self, file_path):
-        y, sr = librosa.load(file_path, sr=self.sr)
-        self.audio_data = y
+        # Imported on first use so the window comes up without them
+        from analysis_cache import audio_hash, get_cache
+        from analysis_engine import load_graph
+        graph = load_graph(file_path, sr=self.sr)
+        self.audio_data = graph.y
         
-        try:
-            self.tempo = float(librosa.feature.rhythm.tempo(y=y, sr=sr)[0])
-        except AttributeError:
-            self.tempo = float(librosa.beat.tempo(y=y, sr=sr)[0])
+        # Reuse a previous analysis of the same audio with the same settings
+        cache = get_cache()
+        decode = {'sr': self.sr, 'mono': True}
+        content_hash = cache.lookup_file(file_path, decode)
+        if content_hash is None:
+            content_hash = audio_hash(graph.y, graph.sr)
+            cache.remember_file(file_path, decode, content_hash)
+        result = cache.get(content_hash, self.analysis_params)
+        if result is None:
+            result = self.compute_analysis(graph)
+            cache.put(content_hash, self.analysis_params, result)
         
-        _, beat_frames = librosa.beat.beat_track(y=y, sr=sr)
-        self.beats = librosa.frames_to_time(beat_frames, sr=sr)
+        self.tempo = float(result['tempo'])
+        self.beats = result['beats']
+        self.chroma = result['chroma']
+        self.times = result['times']
+        self.key = result['key']
+
+    def compute_analysis(self, graph):
+        import librosa
+        sr = graph.sr
+        hop_length = self.analysis_params['hop_length']
+        
+        # Tempo and beats share one onset envelope
+        tempo = graph.tempo()
+        beats = graph.beats()
+        transients = graph.transients()
+        
+        # Chroma analysis
+        chroma = graph.chroma(margin=self.analysis_params['margin'],
+                              hop_length=hop_length,
+                              n_octaves=self.analysis_params['n_octaves'],
+                              bins_per_octave=self.analysis_params['bins_per_octave'])
         
-        y_harmonic = librosa.effects.harmonic(y, margin=4)
-        self.chroma = librosa.feature.chroma_cqt(
-            y=y_harmonic,
-            sr=sr,
-            n_chroma=12,
-            hop_length=2048,
-            n_octaves=6
-        )
+        # Limit to 10 seconds
+        target_frames = int(self.analysis_params['max_time'] * sr / hop_length)
+        chroma = chroma[:, :target_frames]
+        times = librosa.frames_to_time(np.arange(chroma.shape[1]), sr=sr, hop_length=hop_length)
         
-        target_frames = int(10 * sr / 2048)
-        self.chroma = self.chroma[:, :target_frames]
-        self.times = librosa.frames_to_time(np.arange(self.chroma.shape[1]), sr=sr, hop_length=2048)
+        # Key detection
+        chroma_avg = np.mean(chroma, axis=1)
+        key = self.chord_labels[np.argmax(chroma_avg)]
         
-        chroma_avg = np.mean(self.chroma, axis=1)
-        self.key = self.chord_labels[np.argmax(chroma_avg)]
+        return {'key': key, 'tempo': tempo, 'beats': beats, 'chroma': chroma,
+                'times': times, 'transients': transients}
 
     def update_visualizations(self):
         self.ax.clear()
@@ -236,7 +262,7 @@ class SampleLabPro:
                     color = self.colors['highlight'] if intensity > 0.6 else self.colors['secondary']
                     
                     self.chord_ax.add_patch(
-                        plt.Rectangle(
+                        Rectangle(
                             (t, i - bin_width/2),
                             width=0.5,
                             height=bin_width,
@@ -268,21 +294,11 @@ class SampleLabPro:
 
     def export_midi(self):
         if self.chroma is not None:
-            midi = midiutil.MIDIFile(1)
-            midi.addTempo(0, 0, int(round(self.tempo)))
-            
-            chroma_thresh = librosa.util.normalize(self.chroma, axis=0)
-            for t_idx, t in enumerate(self.times):
-                if t_idx >= chroma_thresh.shape[1]:
-                    continue
-                for note_idx in range(12):
-                    if chroma_thresh[note_idx, t_idx] > 0.6:
-                        midi.addNote(0, 0, 60 + note_idx, t, 0.5, 100)
-            
-            with open("chord_export.mid", "wb") as f:
-                midi.writeFile(f)
+            export_chord_midi(self.chroma, self.times, self.tempo, "chord_export.mid",
+                              threshold=0.6)
 
     def export_wav(self):
+        import soundfile as sf
         if self.audio_data is not None and len(self.chop_points) > 1:
             try:
                 base_path = filedialog.asksaveasfilename(defaultextension=".wav")
@@ -299,4 +315,5 @@ class SampleLabPro:
 if __name__ == "__main__":
     root = tk.Tk()
     app = SampleLabPro(root)
+    root.after_idle(warmup.start_background)
     root.mainloop()
\ No newline at end of file
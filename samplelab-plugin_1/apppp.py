@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, filedialog
-import librosa
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import midiutil
-import matplotlib.pyplot as plt
+from matplotlib.patches import Rectangle
 import warnings
+from midi_export import export_chord_midi
+import warmup
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -95,6 +95,8 @@ class SampleLabPro:
             self.update_visualizations()
 
     def analyze_audio(self, file_path):
+        # Imported on first use so the window comes up without it
+        import librosa
         y, sr = librosa.load(file_path, sr=self.sr)
         self.audio_data = y
         
@@ -146,7 +148,7 @@ class SampleLabPro:
                     color = self.colors['active'] if intensity > 0.6 else self.colors['inactive']
                     
                     self.chord_ax.add_patch(
-                        plt.Rectangle(
+                        Rectangle(
                             (t, i - bin_width/2),
                             width=0.5,
                             height=bin_width,
@@ -171,19 +173,8 @@ class SampleLabPro:
 
     def export_midi(self):
         if self.chroma is not None:
-            midi = midiutil.MIDIFile(1)
-            midi.addTempo(0, 0, int(self.tempo))
-            
-            chroma_thresh = librosa.util.normalize(self.chroma, axis=0)
-            for t_idx, t in enumerate(self.times):
-                if t_idx >= chroma_thresh.shape[1]:
-                    continue
-                for note_idx in range(12):
-                    if chroma_thresh[note_idx, t_idx] > 0.6:
-                        midi.addNote(0, 0, 60 + note_idx, t, 0.5, 100)
-            
-            with open("chord_export.mid", "wb") as f:
-                midi.writeFile(f)
+            export_chord_midi(self.chroma, self.times, self.tempo, "chord_export.mid",
+                              threshold=0.6)
 
     def export_wav(self):
         pass
@@ -191,4 +182,5 @@ class SampleLabPro:
 if __name__ == "__main__":
     root = tk.Tk()
     app = SampleLabPro(root)
+    root.after_idle(warmup.start_background)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,183 @@
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from profiling import span
+
+# (format tag, bits per sample) -> on-disk dtype and the scale that maps it to [-1, 1)
+PCM_DTYPES = {
+    (1, 8): ("u1", 1 / 128.0),
+    (1, 16): ("<i2", 1 / 32768.0),
+    (1, 32): ("<i4", 1 / 2147483648.0),
+    (3, 32): ("<f4", 1.0),
+    (3, 64): ("<f8", 1.0),
+}
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+RESAMPLE_PAD = 0.05  # seconds of context around a resampled region
+
+
+class AudioSource:
+    """One open audio file, read in windows instead of decoded up front.
+
+    PCM and float WAV data are memory-mapped, so opening only parses the
+    header and windows are slices of pages the OS shares between every
+    reader. Anything else (24-bit WAV, FLAC, OGG, ...) is read by seeking
+    with soundfile, and files soundfile cannot open at all are decoded
+    once with librosa. Resampling is done per requested region.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._decoded = None
+        self._scale = 1.0
+        header = _parse_wav(path)
+        if header is not None and (header["format"], header["bits"]) in PCM_DTYPES:
+            dtype, self._scale = PCM_DTYPES[header["format"], header["bits"]]
+            self.samplerate = header["samplerate"]
+            self.channels = header["channels"]
+            self.frames = header["frames"]
+            self.subtype = "FLOAT" if header["format"] == 3 else f"PCM_{header['bits']}"
+            if self.frames:
+                self._data = np.memmap(path, dtype=dtype, mode="r", offset=header["offset"],
+                                       shape=(self.frames, self.channels))
+            else:
+                self._data = np.zeros((0, self.channels), dtype=dtype)
+            self.kind = "memmap"
+            return
+        try:
+            info = sf.info(path)
+            self.samplerate, self.channels, self.frames = info.samplerate, info.channels, info.frames
+            self.subtype = info.subtype
+            self.kind = "soundfile"
+        except RuntimeError:
+            y, self.samplerate = librosa.load(path, sr=None, mono=False)
+            self._decoded = np.atleast_2d(y).T
+            self.frames, self.channels = self._decoded.shape
+            self.subtype = None
+            self.kind = "decoded"
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate
+
+    def frame_at(self, t):
+        return min(max(int(round(t * self.samplerate)), 0), self.frames)
+
+    def read(self, start=0, stop=None, mono=True):
+        """Float32 samples of frames ``[start, stop)`` at the native rate.
+
+        Returns ``(frames,)`` when ``mono`` and ``(frames, channels)``
+        otherwise, like ``soundfile.read``.
+        """
+        stop = self.frames if stop is None else min(stop, self.frames)
+        start = min(max(start, 0), stop)
+        if self._data is not None:
+            window = self._data[start:stop]
+            if window.dtype == np.float32 and self._scale == 1.0:
+                y = window
+            elif window.dtype == np.uint8:
+                y = (window.astype(np.float32) - 128) * np.float32(self._scale)
+            else:
+                y = window.astype(np.float32) * np.float32(self._scale)
+        elif self._decoded is not None:
+            y = self._decoded[start:stop]
+        else:
+            with sf.SoundFile(self.path) as f:
+                f.seek(start)
+                y = f.read(stop - start, dtype="float32", always_2d=True)
+        if not mono:
+            return y
+        return y[:, 0] if y.shape[1] == 1 else y.mean(axis=1, dtype=np.float32)
+
+    def window(self, t_start, t_end, sr=None, mono=True):
+        # Samples between two times, resampled to sr with a little context on each
+        # side; the result lines up with the same span of a whole-file resample
+        if sr is None or sr == self.samplerate:
+            return self.read(self.frame_at(t_start), self.frame_at(t_end), mono=mono)
+        first, last = int(round(t_start * sr)), int(round(t_end * sr))
+        # Start the read on a frame that falls exactly on the target grid
+        step = self.samplerate // math.gcd(self.samplerate, sr)
+        lo = max(self.frame_at(t_start) - int(RESAMPLE_PAD * self.samplerate), 0) // step * step
+        hi = min(self.frame_at(t_end) + int(RESAMPLE_PAD * self.samplerate), self.frames)
+        y = librosa.resample(np.ascontiguousarray(self.read(lo, hi, mono=mono).T),
+                             orig_sr=self.samplerate, target_sr=sr, res_type="soxr_hq")
+        offset = first - lo * sr // self.samplerate
+        return y[..., offset:offset + last - first].T
+
+    def load(self, sr=22050, mono=True, duration=None):
+        """Drop-in for ``librosa.load(path, sr=sr, mono=mono, duration=duration)``."""
+        stop = self.frames if duration is None else min(int(round(duration * self.samplerate)), self.frames)
+        with span("decode", kind=self.kind):
+            y = self.read(0, stop, mono=mono)
+        if not mono:
+            # librosa returns 1-D for single-channel files even when mono=False
+            y = y[:, 0] if y.shape[1] == 1 else y.T
+        if sr is not None and sr != self.samplerate:
+            with span("resample", orig_sr=self.samplerate, target_sr=sr):
+                y = librosa.resample(np.ascontiguousarray(y), orig_sr=self.samplerate,
+                                     target_sr=sr, res_type="soxr_hq")
+            return y, sr
+        return np.asarray(y), self.samplerate
+
+
+def _parse_wav(path):
+    # fmt and data chunk of a RIFF/WAVE file, or None if it is not one
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = struct.unpack("<4sI", chunk)
+            if chunk_id == b"fmt ":
+                body = f.read(size)
+                tag, channels, samplerate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = {"format": tag, "channels": channels, "samplerate": samplerate,
+                       "block_align": block_align, "bits": bits}
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None or not fmt["block_align"]:
+                    return None
+                offset = f.tell()
+                # Streaming writers leave the size at 0 or 0xFFFFFFFF
+                size = min(size, file_size - offset) if size else file_size - offset
+                return dict(fmt, offset=offset, frames=size // fmt["block_align"])
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+
+
+_SOURCES = OrderedDict()
+_MAX_SOURCES = 8
+_SOURCES_LOCK = threading.Lock()
+
+
+def open_source(file_path):
+    # Shared AudioSource per file version, so every reader maps the same pages
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+    with _SOURCES_LOCK:
+        source = _SOURCES.get(key)
+        if source is not None:
+            _SOURCES.move_to_end(key)
+            return source
+
+    source = AudioSource(file_path)
+    with _SOURCES_LOCK:
+        _SOURCES[key] = source
+        while len(_SOURCES) > _MAX_SOURCES:
+            _SOURCES.popitem(last=False)
+    return source
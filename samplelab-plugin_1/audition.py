@@ -0,0 +1,334 @@
+import threading
+import time
+
+import numpy as np
+
+from audio_source import AudioSource
+from chop_export import chop_ranges
+
+BLOCK_SIZE = 256
+MAX_VOICES = 8
+FADE_MS = 5.0
+# Triggers waiting for the next callback; older ones are overwritten
+TRIGGER_QUEUE = 64
+# MPC-style 4x4 pad grid on the keyboard, top row first
+PAD_KEYS = "1234qwerasdfzxcv"
+
+
+def fade_ramps(n):
+    # (fade_in, fade_out) of n samples, float32
+    fade_in = np.linspace(0.0, 1.0, n, endpoint=False, dtype=np.float32)
+    return fade_in, fade_in[::-1].copy()
+
+
+class ChopBank:
+    """Pre-rendered, faded chop buffers ready for the mixer.
+
+    Every chop is cut once, with short fades at both ends so triggering
+    or cutting it off never clicks. Buffers of chops that did not change
+    are reused from ``previous`` when the chop list is edited. ``y`` is
+    either samples at ``sr`` or an :class:`AudioSource`; a source is read
+    one chop at a time at its native rate and only that region is
+    resampled to ``sr``.
+    """
+
+    def __init__(self, y, sr, chop_points, fade_ms=FADE_MS, previous=None):
+        self.sr = sr
+        windowed = isinstance(y, AudioSource)
+        if windowed:
+            n_samples = int(y.duration * sr)
+        else:
+            n_samples = 0 if y is None else len(y)
+        self.ranges = [] if y is None else chop_ranges(chop_points, sr, n_samples)
+        fade_len = max(int(fade_ms * sr / 1000), 1)
+        reuse = previous.cache if previous is not None and previous.source is y else {}
+        self.source = y
+        self.cache = {}
+        for _, start, end in self.ranges:
+            buffer = reuse.get((start, end))
+            if buffer is None:
+                chunk = y.window(start / sr, end / sr, sr=sr) if windowed else y[start:end]
+                buffer = np.array(chunk, dtype=np.float32)
+                n = min(fade_len, len(buffer) // 2)
+                if n:
+                    fade_in, fade_out = fade_ramps(n)
+                    buffer[:n] *= fade_in
+                    buffer[-n:] *= fade_out
+            self.cache[(start, end)] = buffer
+        # Indexed by chop number; the mixer only ever reads these
+        self.buffers = tuple(self.cache[(start, end)] for _, start, end in self.ranges)
+
+    def __len__(self):
+        return len(self.buffers)
+
+
+class AuditionEngine:
+    """Plays chops on demand through a callback-driven mixer.
+
+    ``trigger`` only writes the chop number into a preallocated queue;
+    the sink's callback starts the voice and mixes every playing voice
+    into a preallocated block with in-place NumPy operations, so no array
+    is allocated while audio is running. Retriggering a playing chop
+    restarts it (one voice per pad, as on an MPC); when all voices are
+    busy the one that has played longest is taken. ``stats`` reports
+    callback time, trigger-to-sound latency and the sink's underruns.
+    """
+
+    def __init__(self, sink, max_voices=MAX_VOICES, gain=0.8, fade_ms=FADE_MS):
+        self.sink = sink
+        self.sr = sink.sr
+        self.max_voices = max_voices
+        self.gain = gain
+        self.fade_ms = fade_ms
+        self.bank = ChopBank(None, sink.sr, [])
+        self.stats = {"callbacks": 0, "last_ms": 0.0, "max_ms": 0.0, "latency_ms": 0.0,
+                      "max_latency_ms": 0.0}
+
+        self._mix = np.zeros(sink.block_size, dtype=np.float32)
+        self._chop = np.zeros(max_voices, dtype=np.int64)
+        self._pos = np.zeros(max_voices, dtype=np.int64)
+        self._trigger_time = np.zeros(max_voices)
+        self._active = np.zeros(max_voices, dtype=bool)
+        self._voice_bank = self.bank
+        self._queue = np.zeros(TRIGGER_QUEUE, dtype=np.int64)
+        self._queue_time = np.zeros(TRIGGER_QUEUE)
+        self._written = 0
+        self._read = 0
+        self._stop_all = False
+
+    def start(self):
+        self.sink.start(self._callback)
+        return self
+
+    def close(self):
+        self.sink.stop()
+
+    def load(self, y, sr, chop_points):
+        # Renders on the caller's thread; the callback picks the new bank up
+        # with a single attribute read, and drops voices of the old one.
+        # y is samples at sr or an AudioSource (resampled per chop)
+        if y is not None and sr != self.sr:
+            raise ValueError(f"Audio at {sr} Hz cannot play on a {self.sr} Hz sink")
+        self.bank = ChopBank(y, sr, chop_points, self.fade_ms, previous=self.bank)
+        return len(self.bank)
+
+    def trigger(self, index):
+        if not 0 <= index < len(self.bank):
+            return False
+        slot = self._written % TRIGGER_QUEUE
+        self._queue[slot] = index
+        self._queue_time[slot] = time.perf_counter()
+        self._written += 1
+        return True
+
+    def stop_all(self):
+        self._stop_all = True
+
+    @property
+    def underruns(self):
+        return self.sink.underruns
+
+    def _callback(self, out):
+        start = time.perf_counter()
+        self._render(out)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.stats["callbacks"] += 1
+        self.stats["last_ms"] = elapsed
+        if elapsed > self.stats["max_ms"]:
+            self.stats["max_ms"] = elapsed
+
+    def _render(self, out):
+        # out: (frames, channels) float32, overwritten in place
+        frames = len(out)
+        mix = self._mix[:frames]
+        mix.fill(0.0)
+        bank = self.bank
+        if bank is not self._voice_bank or self._stop_all:
+            # Queued chop numbers were checked against the old bank
+            self._active.fill(False)
+            self._read = self._written
+            self._voice_bank = bank
+            self._stop_all = False
+        # Skip triggers the queue has already overwritten
+        self._read = max(self._read, self._written - TRIGGER_QUEUE)
+        while self._read < self._written:
+            slot = self._read % TRIGGER_QUEUE
+            self._start_voice(bank, self._queue[slot], self._queue_time[slot])
+            self._read += 1
+
+        now = time.perf_counter()
+        for voice in range(self.max_voices):
+            if not self._active[voice]:
+                continue
+            buffer = bank.buffers[self._chop[voice]]
+            pos = self._pos[voice]
+            if pos == 0:
+                latency = float(now - self._trigger_time[voice] + self.sink.latency) * 1000
+                self.stats["latency_ms"] = latency
+                if latency > self.stats["max_latency_ms"]:
+                    self.stats["max_latency_ms"] = latency
+            n = min(frames, len(buffer) - pos)
+            mix[:n] += buffer[pos:pos + n]
+            if pos + n >= len(buffer):
+                self._active[voice] = False
+            else:
+                self._pos[voice] = pos + n
+        np.multiply(mix, self.gain, out=mix)
+        np.clip(mix, -1.0, 1.0, out=mix)
+        out[:] = mix[:, None]
+
+    def _start_voice(self, bank, chop, trigger_time):
+        # A trigger can still race a load; never index past the bank
+        if chop >= len(bank.buffers):
+            return
+        # The voice already playing this chop, else the first free one
+        voice = -1
+        for v in range(self.max_voices):
+            if not self._active[v]:
+                if voice < 0:
+                    voice = v
+            elif self._chop[v] == chop:
+                voice = v
+                break
+        if voice < 0:
+            voice = self._pos.argmax()
+        self._chop[voice] = chop
+        self._pos[voice] = 0
+        self._trigger_time[voice] = trigger_time
+        self._active[voice] = True
+
+
+# --- Sinks: start(callback) calls callback(out) for every (block_size, channels) block ---
+class NullSink:
+    """Discards the audio but keeps a sound card's timing, for headless use.
+
+    With ``realtime`` a thread calls the callback once per block period
+    and counts an underrun whenever a block is not ready by its deadline.
+    ``pump`` renders blocks synchronously instead, as fast as possible.
+    """
+
+    def __init__(self, sr=44100, block_size=BLOCK_SIZE, channels=1, realtime=True):
+        self.sr = sr
+        self.block_size = block_size
+        self.channels = channels
+        self.realtime = realtime
+        self.underruns = 0
+        self.blocks = 0
+        self._out = np.zeros((block_size, channels), dtype=np.float32)
+        self._callback = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def latency(self):
+        # Output buffering between the callback and the speaker
+        return self.block_size / self.sr
+
+    def start(self, callback):
+        self._callback = callback
+        self.open()
+        if self.realtime:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def pump(self, n_blocks=1):
+        for _ in range(n_blocks):
+            self._callback(self._out)
+            self.write(self._out)
+            self.blocks += 1
+
+    def _run(self):
+        period = self.block_size / self.sr
+        deadline = time.perf_counter() + period
+        while not self._stop.is_set():
+            self.pump()
+            now = time.perf_counter()
+            if now > deadline:
+                # Missed the slot: the card would have played silence
+                self.underruns += 1
+                deadline = now
+            time.sleep(max(deadline - time.perf_counter(), 0.0))
+            deadline += period
+
+    def open(self):
+        pass
+
+    def write(self, out):
+        pass
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.close()
+
+    def close(self):
+        pass
+
+
+class FileSink(NullSink):
+    """A :class:`NullSink` that also records everything it plays to ``path``."""
+
+    def __init__(self, path, sr=44100, block_size=BLOCK_SIZE, channels=1, realtime=False):
+        super().__init__(sr, block_size, channels, realtime)
+        self.path = path
+        self._file = None
+
+    def open(self):
+        import soundfile as sf
+        self._file = sf.SoundFile(self.path, "w", samplerate=self.sr, channels=self.channels,
+                                  subtype="FLOAT")
+
+    def write(self, out):
+        self._file.write(out)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class DeviceSink:
+    """Sound card output through the optional ``sounddevice`` package."""
+
+    def __init__(self, sr=44100, block_size=BLOCK_SIZE, device=None, channels=2):
+        self.sr = sr
+        self.block_size = block_size
+        self.device = device
+        self.channels = channels
+        self.underruns = 0
+        self._stream = None
+
+    @property
+    def latency(self):
+        return self._stream.latency if self._stream is not None else self.block_size / self.sr
+
+    def start(self, callback):
+        import sounddevice
+
+        def on_audio(outdata, frames, time_info, status):
+            if status.output_underflow:
+                self.underruns += 1
+            callback(outdata)
+
+        self._stream = sounddevice.OutputStream(samplerate=self.sr, blocksize=self.block_size,
+                                                device=self.device, channels=self.channels,
+                                                dtype="float32", latency="low", callback=on_audio)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+def default_sink(sr=44100, block_size=BLOCK_SIZE):
+    # The sound card if sounddevice and an output device are available, else None
+    try:
+        import sounddevice
+        sounddevice.query_devices(kind="output")
+    except (ImportError, OSError, ValueError):
+        return None
+    return DeviceSink(sr, block_size)
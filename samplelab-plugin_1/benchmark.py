@@ -0,0 +1,338 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from types import SimpleNamespace
+
+import numpy as np
+import soundfile as sf
+
+LENGTHS = (10, 60, 600)
+BENCH_SR = 44100
+BENCH_BPM = 120
+DEFAULT_REPEATS = 3
+
+
+# --- Synthetic audio ---
+def make_audio(length, out_dir, sr=BENCH_SR):
+    # Drums plus chords in C major at BENCH_BPM, trimmed to length seconds; reused if present
+    from create_test_samples import chord_loop
+    path = os.path.join(out_dir, f"loop_{length}s.wav")
+    if not os.path.exists(path):
+        bars = int(np.ceil(length / (4 * 60.0 / BENCH_BPM)))
+        y = chord_loop(0, "Major", BENCH_BPM, bars=bars, sr=sr)[:int(length * sr)]
+        sf.write(path, y.astype(np.float32), sr, subtype="PCM_16")
+    return path
+
+
+# --- Headless GUI host ---
+class _Var:
+    def __init__(self, master=None, value=None):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class _Widget:
+    # Accepts any Tk widget call and does nothing with it
+    def __init__(self, *args, **kwargs):
+        self._options = dict(kwargs)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def __setitem__(self, key, value):
+        self._options[key] = value
+
+    def __getitem__(self, key):
+        return self._options.get(key)
+
+    def config(self, **kwargs):
+        self._options.update(kwargs)
+
+    configure = config
+
+
+class _Widgets:
+    # Stands in for the tk/ttk modules: constants are real, everything else is a _Widget
+    def __init__(self, **overrides):
+        from tkinter import constants
+        self.__dict__.update({name: getattr(constants, name) for name in dir(constants)
+                              if name.isupper()}, **overrides)
+
+    def __getattr__(self, name):
+        return _Widget
+
+
+def headless_app():
+    """A SampleLabPro drawing into Agg canvases, for machines without a display."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import app
+
+    class Canvas(FigureCanvasAgg):
+        def __init__(self, figure, master=None):
+            super().__init__(figure)
+
+        def get_tk_widget(self):
+            return _Widget()
+
+    app.tk = _Widgets(StringVar=_Var, BooleanVar=_Var, DoubleVar=_Var, IntVar=_Var)
+    app.ttk = _Widgets()
+    app.FigureCanvasTkAgg = Canvas
+    return app, app.SampleLabPro(_Widget())
+
+
+def _loaded_app(audio_path):
+    app, gui = headless_app()
+    gui.analyze_audio(audio_path)
+    gui.file_path = audio_path
+    gui.generate_chops()
+    return app, gui
+
+
+# --- Cases: each returns the seconds spent in the measured call ---
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def case_analyze_audio(audio_path, work_dir):
+    import process_audio
+    return _timed(process_audio.analyze_audio, audio_path)
+
+
+def case_analyze_audio_legacy(audio_path, work_dir):
+    import processs_audio
+    return _timed(processs_audio.analyze_audio, audio_path)
+
+
+def case_app_analysis(audio_path, work_dir):
+    app, gui = headless_app()
+    return _timed(gui.analyze_audio, audio_path)
+
+
+def case_update_visualizations(audio_path, work_dir):
+    app, gui = _loaded_app(audio_path)
+    gui.update_visualizations()
+    return statistics.median(_timed(gui.update_visualizations) for _ in range(5))
+
+
+def case_switch_chop_preset(audio_path, work_dir):
+    # Seconds per preset switch once the waveform has been drawn
+    app, gui = _loaded_app(audio_path)
+    gui.update_visualizations()
+    presets = list(gui.artist_presets)
+
+    def switch_all():
+        for name in presets:
+            gui.selected_artist.set(name)
+            gui.generate_chops()
+    return statistics.median(_timed(switch_all) for _ in range(5)) / len(presets)
+
+
+def case_export_midi(audio_path, work_dir):
+    app, gui = _loaded_app(audio_path)
+    os.chdir(work_dir)
+    return _timed(gui.export_midi)
+
+
+def case_export_wav(audio_path, work_dir):
+    app, gui = _loaded_app(audio_path)
+    app.filedialog = SimpleNamespace(asksaveasfilename=lambda **kwargs: os.path.join(work_dir, "bench.wav"))
+
+    def export():
+        gui.export_wav()
+        # Export runs on a background job; wait for it like the Tk poll would
+        job = gui.export_job
+        while not job.done:
+            job.drain()
+            time.sleep(0.001)
+        if job.error is not None:
+            raise job.error
+    return _timed(export)
+
+
+def case_create_pro_waveform(audio_path, work_dir):
+    from generate_thumbnails import create_pro_waveform
+    from waveform_peaks import peaks_path
+    if os.path.exists(peaks_path(audio_path)):
+        os.remove(peaks_path(audio_path))
+    return _timed(create_pro_waveform, audio_path, os.path.join(work_dir, "thumb.png"))
+
+
+CASES = {
+    "analyze_audio": case_analyze_audio,
+    "analyze_audio_legacy": case_analyze_audio_legacy,
+    "app_analysis": case_app_analysis,
+    "update_visualizations": case_update_visualizations,
+    "switch_chop_preset": case_switch_chop_preset,
+    "export_midi": case_export_midi,
+    "export_wav": case_export_wav,
+    "create_pro_waveform": case_create_pro_waveform,
+}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case_here(case, audio_path, work_dir):
+    # Child-process entry: one measured call, printed as JSON on the last line
+    warnings.filterwarnings("ignore")
+    seconds = CASES[case](audio_path, work_dir)
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": _peak_rss_mb()}))
+
+
+def run_case(case, audio_path, timeout=None):
+    # Fresh interpreter, analysis cache and output directory per run, so runs
+    # never warm each other up and peak RSS belongs to this case alone
+    with tempfile.TemporaryDirectory(prefix="samplelab-bench-") as work_dir:
+        env = dict(os.environ, MPLBACKEND="Agg",
+                   SAMPLELAB_CACHE_DIR=os.path.join(work_dir, "cache"),
+                   SAMPLELAB_INDEX_DIR=os.path.join(work_dir, "index"))
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "_case", case, audio_path, work_dir],
+            capture_output=True, text=True, env=env, timeout=timeout,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmarks(cases=tuple(CASES), lengths=LENGTHS, repeats=DEFAULT_REPEATS,
+                   audio_dir="bench_audio", on_result=None):
+    os.makedirs(audio_dir, exist_ok=True)
+    results = []
+    for length in lengths:
+        audio_path = os.path.abspath(make_audio(length, audio_dir))
+        for case in cases:
+            runs, error = [], None
+            for _ in range(repeats):
+                try:
+                    runs.append(run_case(case, audio_path))
+                except (RuntimeError, subprocess.TimeoutExpired) as e:
+                    error = str(e)
+                    break
+            row = {"case": case, "length": length, "repeats": len(runs)}
+            if runs:
+                row["seconds"] = statistics.median(r["seconds"] for r in runs)
+                row["seconds_min"] = min(r["seconds"] for r in runs)
+                row["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+            if error:
+                row["error"] = error
+            results.append(row)
+            if on_result:
+                on_result(row)
+    return results
+
+
+def environment():
+    import librosa
+    import matplotlib
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "numpy": np.__version__,
+            "librosa": librosa.__version__, "matplotlib": matplotlib.__version__}
+
+
+def _format_row(row):
+    if "seconds" not in row:
+        return f"{row['case']:<24} {row['length']:>5}s  error: {row.get('error', '')}"
+    return (f"{row['case']:<24} {row['length']:>5}s  {row['seconds']:>9.3f} s  "
+            f"{row['peak_rss_mb']:>8.1f} MB")
+
+
+def compare(old, new, threshold=0.10):
+    """Rows of (case, length, old s, new s, ratio, old MB, new MB, regressed)."""
+    before = {(r["case"], r["length"]): r for r in old["results"] if "seconds" in r}
+    rows = []
+    for r in new["results"]:
+        o = before.get((r["case"], r["length"]))
+        if o is None or "seconds" not in r:
+            continue
+        ratio = r["seconds"] / o["seconds"] if o["seconds"] > 0 else float("inf")
+        rows.append((r["case"], r["length"], o["seconds"], r["seconds"], ratio,
+                     o["peak_rss_mb"], r["peak_rss_mb"], ratio > 1 + threshold))
+    return rows
+
+
+def cmd_run(args):
+    cases = args.cases.split(",") if args.cases else list(CASES)
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        sys.exit(f"Unknown cases: {', '.join(sorted(unknown))}")
+    lengths = [int(v) for v in args.lengths.split(",")]
+    results = run_benchmarks(cases, lengths, args.repeat, args.audio_dir,
+                             on_result=lambda row: print(_format_row(row), flush=True))
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+def cmd_compare(args):
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f"{old['environment'].get('commit', '?')} -> {new['environment'].get('commit', '?')}")
+    regressed = False
+    for case, length, t_old, t_new, ratio, m_old, m_new, slower in compare(old, new, args.threshold):
+        flag = "  SLOWER" if slower else ""
+        print(f"{case:<24} {length:>5}s  {t_old:>8.3f} -> {t_new:>8.3f} s  x{ratio:<5.2f} "
+              f"{m_old:>7.1f} -> {m_new:>7.1f} MB{flag}")
+        regressed |= slower
+    # Non-zero exit lets CI fail on a regression
+    sys.exit(1 if regressed else 0)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "_case":
+        _run_case_here(*argv[1:4])
+        return
+
+    parser = argparse.ArgumentParser(description="Time SampleLab's analysis, render and export paths")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks and write JSON results")
+    run.add_argument("-o", "--output", default="benchmark_results.json")
+    run.add_argument("--cases", default=None, help=f"comma-separated subset of: {', '.join(CASES)}")
+    run.add_argument("--lengths", default=",".join(str(n) for n in LENGTHS),
+                     help="comma-separated audio lengths in seconds")
+    run.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEATS,
+                     help="fresh-process runs per case; the median is reported")
+    run.add_argument("--audio-dir", default="bench_audio", help="where the synthetic audio is kept")
+    run.set_defaults(func=cmd_run)
+
+    comp = commands.add_parser("compare", help="compare two result files")
+    comp.add_argument("old")
+    comp.add_argument("new")
+    comp.add_argument("--threshold", type=float, default=0.10,
+                      help="slowdown ratio above which a case counts as regressed")
+    comp.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
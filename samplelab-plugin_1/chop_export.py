@@ -0,0 +1,116 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from audio_source import open_source
+
+FORMATS = {"wav": "WAV", "flac": "FLAC", "ogg": "OGG"}
+# Bit depth -> libsndfile subtype; OGG is always Vorbis whatever the depth
+SUBTYPES = {
+    "wav": {16: "PCM_16", 24: "PCM_24", 32: "FLOAT"},
+    "flac": {16: "PCM_16", 24: "PCM_24"},
+}
+
+
+def chop_ranges(chop_points, sr, n_samples):
+    # (index, start_sample, end_sample) for every chop that fits the buffer
+    points = np.round(np.asarray(chop_points, dtype=np.float64) * sr).astype(np.int64)
+    starts, ends = points[:-1], points[1:]
+    valid = np.flatnonzero((starts >= 0) & (starts < ends) & (ends <= n_samples))
+    return [(int(i), int(starts[i]), int(ends[i])) for i in valid]
+
+
+def subtype_for(fmt, bit_depth):
+    if fmt == "ogg":
+        return "VORBIS"
+    if fmt == "flac":
+        # FLAC tops out at 24-bit; deeper sources and requests are written at 24
+        bit_depth = min(bit_depth, 24)
+    if bit_depth not in SUBTYPES[fmt]:
+        raise ValueError(f"{fmt.upper()} export does not support {bit_depth}-bit")
+    return SUBTYPES[fmt][bit_depth]
+
+
+def source_bit_depth(subtype):
+    # Bit depth to export at for a source subtype, when the caller does not pick one
+    return {"PCM_24": 24, "PCM_32": 32, "FLOAT": 32, "DOUBLE": 32}.get(subtype, 16)
+
+
+def export_chops(y, sr, chop_points, base_path, fmt="wav", bit_depth=16, beats=None,
+                 workers=None, on_progress=None):
+    """Write every chop of ``y`` to ``<base_path>_chop_<n>.<fmt>`` plus a manifest.
+
+    Chops are views into ``y``, never copies, and are encoded on a thread
+    pool (libsndfile releases the GIL). Each file is written under a
+    temporary name and renamed into place, and the manifest goes last, so
+    an interrupted export leaves no partial files behind. Returns the
+    manifest path.
+    """
+    return _export(lambda start, end: y[start:end], sr, len(y), chop_points, base_path,
+                   fmt, bit_depth, beats, workers, on_progress, {})
+
+
+def export_file_chops(file_path, chop_points, base_path, fmt="wav", bit_depth=None, beats=None,
+                      workers=None, on_progress=None):
+    """Like :func:`export_chops`, but cut from the original file at its own rate.
+
+    Chop times are mapped to frames of ``file_path`` and only those frame
+    ranges are read, with every channel, so the chops keep the source's
+    sample rate and bandwidth however low the analysis rate was.
+    ``bit_depth`` defaults to the source's.
+    """
+    source = open_source(file_path)
+    if bit_depth is None:
+        bit_depth = source_bit_depth(source.subtype)
+
+    def read(start, end):
+        return source.read(start, end, mono=False)
+
+    return _export(read, source.samplerate, source.frames, chop_points, base_path, fmt, bit_depth,
+                   beats, workers, on_progress, {"source": os.path.abspath(file_path),
+                                                 "channels": source.channels})
+
+
+def _export(read, sr, n_samples, chop_points, base_path, fmt, bit_depth, beats, workers,
+            on_progress, extra):
+    fmt = fmt.lower().lstrip(".")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    subtype = subtype_for(fmt, bit_depth)
+    ranges = chop_ranges(chop_points, sr, n_samples)
+    points = np.asarray(chop_points, dtype=np.float64)
+    beats = np.asarray(beats if beats is not None else [], dtype=np.float64)
+
+    def write(chop):
+        i, start, end = chop
+        path = f"{base_path}_chop_{i + 1}.{fmt}"
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            sf.write(tmp_path, read(start, end), sr, format=FORMATS[fmt], subtype=subtype)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    entries = []
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        for n, ((i, start, end), path) in enumerate(zip(ranges, pool.map(write, ranges)), 1):
+            beat_index = int(np.argmin(np.abs(beats - points[i]))) if beats.size else None
+            entries.append({"file": os.path.basename(path), "start": float(points[i]),
+                            "end": float(points[i + 1]), "start_sample": start,
+                            "end_sample": end, "beat_index": beat_index})
+            if on_progress:
+                on_progress(n, len(ranges))
+
+    manifest_path = f"{base_path}_chops.json"
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"sample_rate": sr, "format": fmt, "subtype": subtype, **extra,
+                   "chops": entries}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
@@ -3,20 +3,72 @@ import numpy as np
 
 NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
+# Chord qualities as intervals above the root; every root gets one template each
+CHORD_QUALITIES = {'': (0, 4, 7), 'm': (0, 3, 7), '7': (0, 4, 7, 10)}
+
+
+def _chord_templates():
+    labels, columns = [], []
+    for suffix, intervals in CHORD_QUALITIES.items():
+        for root in range(12):
+            column = np.zeros(12)
+            column[[(root + i) % 12 for i in intervals]] = 1.0
+            columns.append(column / np.linalg.norm(column))
+            labels.append(NOTE_NAMES[root] + suffix)
+    # Last state is "no chord", matched by flat or silent frames
+    columns.append(np.full(12, 1 / np.sqrt(12)))
+    labels.append('N')
+    return np.stack(columns, axis=1), labels
+
+
+CHORD_TEMPLATES, CHORD_LABELS = _chord_templates()
+
+
+def change_points(idx):
+    # Positions where an integer label sequence changes, including 0
+    idx = np.asarray(idx)
+    if idx.size == 0:
+        return np.zeros(0, dtype=int)
+    return np.concatenate([[0], np.flatnonzero(np.diff(idx)) + 1])
+
+
+def dominant_notes(chroma, times):
+    """Strongest pitch class at every change, as ``(note_idx, change_times)`` arrays."""
+    idx = np.argmax(chroma, axis=0)
+    changes = change_points(idx)
+    return idx[changes], np.asarray(times)[changes]
+
+
+def detect_chords(chroma, times, self_transition=0.95, sharpness=20.0):
+    """Chord segments from a chroma matrix, as compact integer arrays.
+
+    Frames are scored against the major, minor and dominant 7th
+    templates (``CHORD_TEMPLATES``, 12 x K) with one matrix product, and
+    the per-frame scores are smoothed with Viterbi decoding so a chord
+    only changes when the evidence holds for a while. Returns
+    ``(chord_idx, start_times)`` per segment; ``CHORD_LABELS[chord_idx]``
+    names them. Cheap enough to rerun on the visible slice while scrubbing.
+    """
+    times = np.asarray(times)
+    if chroma.shape[1] == 0:
+        return np.zeros(0, dtype=int), times[:0]
+    scores = CHORD_TEMPLATES.T @ librosa.util.normalize(chroma, norm=2, axis=0)
+    # Softmax over templates turns cosine scores into per-frame state probabilities
+    probs = np.exp(sharpness * (scores - scores.max(axis=0)))
+    probs /= probs.sum(axis=0)
+    transition = librosa.sequence.transition_loop(len(CHORD_LABELS), self_transition)
+    path = librosa.sequence.viterbi_discriminative(probs, transition)
+    changes = change_points(path)
+    return path[changes], times[changes]
+
+
 def detect_chords_and_notes(y, sr):
     chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
     times = librosa.times_like(chroma)
 
-    # Averaged chroma to find dominant notes
-    note_indices = np.argmax(chroma, axis=0)
-    note_names = [NOTE_NAMES[i] for i in note_indices]
-
-    # Collapse repeated notes to show only changes (to simulate chords)
-    display_notes = []
-    display_times = []
-    for i in range(len(note_names)):
-        if i == 0 or note_names[i] != note_names[i-1]:
-            display_notes.append(note_names[i])
-            display_times.append(times[i])
+    # Dominant note per frame, collapsed to the frames where it changes
+    note_idx, change_times = dominant_notes(chroma, times)
+    display_notes = [NOTE_NAMES[i] for i in note_idx]
+    display_times = change_times.tolist()
 
     return display_notes, display_times
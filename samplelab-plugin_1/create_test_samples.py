@@ -1,12 +1,82 @@
 # save as create_test_samples.py
+import json
+import os
+
 import numpy as np
 import soundfile as sf
 
-# Generate a sine wave (440Hz)
-sr = 22050
-duration = 3  # seconds
-t = np.linspace(0, duration, int(sr * duration))
-y = 0.5 * np.sin(2 * np.pi * 440 * t)
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+# Root offsets and chord intervals of the I-IV-V-I / i-iv-v-i loops
+PROGRESSION = (0, 5, 7, 0)
+TRIADS = {"Major": (0, 4, 7), "Minor": (0, 3, 7)}
+
+
+def sine(freq=440, duration=3, sr=22050, amplitude=0.5):
+    t = np.linspace(0, duration, int(sr * duration))
+    return amplitude * np.sin(2 * np.pi * freq * t)
+
+
+def midi_to_hz(note):
+    return 440.0 * 2 ** ((note - 69) / 12)
+
+
+def drum_pattern(bpm, duration, sr=22050, seed=0):
+    # Kick on every beat, noise hat on every offbeat
+    rng = np.random.default_rng(seed)
+    y = np.zeros(int(sr * duration))
+    beat = 60.0 / bpm
+    t = np.arange(int(0.15 * sr)) / sr
+    kick = np.sin(2 * np.pi * 60 * t) * np.exp(-t * 30)
+    hat = rng.standard_normal(int(0.03 * sr)) * np.exp(-np.arange(int(0.03 * sr)) / (0.005 * sr))
+    for onset in np.arange(0, duration, beat):
+        for sound, at, gain in ((kick, onset, 0.8), (hat, onset + beat / 2, 0.2)):
+            start = int(at * sr)
+            stop = min(start + len(sound), len(y))
+            if start < stop:
+                y[start:stop] += gain * sound[:stop - start]
+    return y
+
+
+def chord_loop(tonic, mode, bpm, bars=8, sr=22050, seed=0):
+    """Drums plus a one-chord-per-bar progression in a known key and tempo."""
+    bar = 4 * 60.0 / bpm
+    duration = bars * bar
+    y = drum_pattern(bpm, duration, sr, seed)
+    t = np.arange(int(bar * sr)) / sr
+    envelope = np.minimum(1.0, t / 0.02) * np.exp(-t * 0.8)
+    for i in range(bars):
+        root = 48 + tonic + PROGRESSION[i % len(PROGRESSION)]
+        chord = np.zeros_like(t)
+        for note in [root - 12] + [root + 12 + interval for interval in TRIADS[mode]]:
+            f = midi_to_hz(note)
+            chord += np.sin(2 * np.pi * f * t) + 0.3 * np.sin(4 * np.pi * f * t)
+        start = int(i * bar * sr)
+        stop = min(start + len(t), len(y))
+        y[start:stop] += 0.1 * (chord * envelope)[:stop - start]
+    return 0.9 * y / np.max(np.abs(y))
+
+
+def write_reference_set(out_dir="reference_samples", sr=22050,
+                        bpms=(80, 92, 100, 110, 120, 128, 140, 150)):
+    # One loop per tonic, alternating mode and cycling tempo; answers go to reference.json
+    os.makedirs(out_dir, exist_ok=True)
+    reference = {}
+    for tonic in range(12):
+        mode = "Major" if tonic % 2 == 0 else "Minor"
+        bpm = bpms[tonic % len(bpms)]
+        name = f"{NOTE_NAMES[tonic].replace('#', 's')}_{mode.lower()}_{bpm}bpm.wav"
+        sf.write(os.path.join(out_dir, name), chord_loop(tonic, mode, bpm, sr=sr, seed=tonic), sr)
+        reference[name] = {"key": f"{NOTE_NAMES[tonic]} {mode}", "tempo": bpm}
+    with open(os.path.join(out_dir, "reference.json"), "w") as f:
+        json.dump(reference, f, indent=2)
+    return reference
+
+
+if __name__ == "__main__":
+    # Generate a sine wave (440Hz)
+    sr = 22050
 
-# Save to sample_database/
-sf.write("sample_database/sine_440hz.wav", y, sr)
\ No newline at end of file
+    # Save to sample_database/
+    os.makedirs("sample_database", exist_ok=True)
+    sf.write("sample_database/sine_440hz.wav", sine(440, 3, sr), sr)
+    write_reference_set("reference_samples", sr)
@@ -1,40 +1,138 @@
+import argparse
+import hashlib
+import json
 import os
-import librosa
-import matplotlib.pyplot as plt
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from audio_source import open_source
+from waveform_peaks import load_or_build, load_peaks
+
+MANIFEST_NAME = ".thumbnails.json"
 
-def create_pro_waveform(file_path, output_path):
-    y, sr = librosa.load(file_path, sr=22050)
+def create_pro_waveform(file_path, output_path, width_px=2000):
+    # Peaks come from the saved pyramid when it is up to date
+    pyramid = load_peaks(file_path, 22050)
+    if pyramid is None:
+        y, sr = open_source(file_path).load(sr=22050)
+        pyramid = load_or_build(file_path, y, sr)
+    t, lo, hi = pyramid.window(0, pyramid.duration, width_px)
     
     # Normalize audio
-    y = librosa.util.normalize(y)
+    peak = max(np.max(np.abs(lo)), np.max(np.abs(hi))) if t.size else 0
+    if peak > 0:
+        lo, hi = lo / peak, hi / peak
     
-    # Create time axis
-    t = np.linspace(0, len(y)/sr, len(y))
-    
-    # High-quality figure
-    plt.figure(figsize=(10, 2), dpi=200)
-    ax = plt.gca()
+    # High-quality figure, rendered with Agg directly (no pyplot state)
+    fig = Figure(figsize=(10, 2), dpi=200)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
     
     # Gradient fill
-    ax.fill_between(t, y, color='#1DB954', alpha=0.3)
+    ax.fill_between(t, lo, hi, color='#1DB954', alpha=0.3)
     
-    # Waveform line
-    ax.plot(t, y, color='#1DB954', lw=0.8)
+    # Waveform outline
+    ax.plot(t, hi, color='#1DB954', lw=0.8)
+    ax.plot(t, lo, color='#1DB954', lw=0.8)
     
     # Remove borders
     ax.axis('off')
-    plt.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
     
     # Save
-    plt.savefig(output_path, bbox_inches='tight', pad_inches=0, transparent=True)
-    plt.close()
+    fig.savefig(output_path, bbox_inches='tight', pad_inches=0, transparent=True)
 
-# Generate thumbnails
-os.makedirs("thumbnails", exist_ok=True)
+def source_signature(file_path, use_hash=False):
+    # What a thumbnail was built from; a change means it must be rebuilt
+    stat = os.stat(file_path)
+    signature = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if use_hash:
+        h = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        signature = {"hash": h.hexdigest()}
+    return signature
+
+def _render(job):
+    input_path, output_path = job
+    try:
+        create_pro_waveform(input_path, output_path)
+        return input_path, None
+    except Exception as e:
+        return input_path, f"{type(e).__name__}: {e}"
+
+def build_thumbnails(src_dir="sample_database", out_dir="thumbnails", workers=None,
+                     force=False, use_hash=False):
+    """Render thumbnails for new or changed .wav files in parallel.
+
+    A manifest in ``out_dir`` records the size/mtime (or content hash with
+    ``use_hash``) each PNG was built from. Returns a dict with the number
+    of files rendered, skipped and failed and the render throughput.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs, signatures, skipped = [], {}, 0
+    for file in sorted(os.listdir(src_dir)):
+        if not file.endswith(".wav"):
+            continue
+        input_path = os.path.join(src_dir, file)
+        output_path = os.path.join(out_dir, f"{file}.png")
+        signatures[file] = source_signature(input_path, use_hash)
+        if not force and manifest.get(file) == signatures[file] and os.path.exists(output_path):
+            skipped += 1
+            continue
+        jobs.append((input_path, output_path))
 
-for file in os.listdir("sample_database"):
-    if file.endswith(".wav"):
-        input_path = os.path.join("sample_database", file)
-        output_path = os.path.join("thumbnails", f"{file}.png")
-        create_pro_waveform(input_path, output_path)
\ No newline at end of file
+    start = time.time()
+    errors = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for input_path, error in pool.map(_render, jobs, chunksize=4):
+                file = os.path.basename(input_path)
+                if error is None:
+                    manifest[file] = signatures[file]
+                else:
+                    errors[input_path] = error
+                    manifest.pop(file, None)
+    elapsed = time.time() - start
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+    rendered = len(jobs) - len(errors)
+    return {"rendered": rendered, "skipped": skipped, "errors": errors,
+            "seconds": elapsed, "files_per_second": rendered / elapsed if elapsed > 0 else 0.0}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate waveform thumbnails")
+    parser.add_argument("--src", default="sample_database")
+    parser.add_argument("--out", default="thumbnails")
+    parser.add_argument("-j", "--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rebuild every thumbnail")
+    parser.add_argument("--hash", action="store_true", help="detect changes by content hash")
+    args = parser.parse_args(argv)
+
+    print_report(build_thumbnails(args.src, args.out, workers=args.workers,
+                                  force=args.force, use_hash=args.hash))
+
+def print_report(stats):
+    print(f"Rendered {stats['rendered']} thumbnails, skipped {stats['skipped']} up to date "
+          f"({stats['files_per_second']:.1f} files/s)")
+    for path, error in sorted(stats["errors"].items()):
+        print(f"  {path}: {error}")
+
+# Generate thumbnails
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import numpy as np
+
+KEY_MAPPING = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+MAJOR_PROFILE = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+MINOR_PROFILE = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+
+
+def _standardize(x):
+    # Zero mean, unit norm along the last axis, so a dot product is a Pearson correlation
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x.mean(axis=-1, keepdims=True)
+    norm = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.where(norm > 0, norm, 1.0)
+
+
+def _key_profiles():
+    # Rows 0-11: C..B major, rows 12-23: C..B minor
+    major = [np.roll(MAJOR_PROFILE, tonic) for tonic in range(12)]
+    minor = [np.roll(MINOR_PROFILE, tonic) for tonic in range(12)]
+    return _standardize(np.array(major + minor))
+
+
+KEY_PROFILES = _key_profiles()
+KEY_NAMES = [f"{note} Major" for note in KEY_MAPPING] + [f"{note} Minor" for note in KEY_MAPPING]
+
+
+def score_keys(chroma_means):
+    # (N, 12) chroma means -> (N, 24) correlations with every key profile
+    return _standardize(np.atleast_2d(chroma_means)) @ KEY_PROFILES.T
+
+
+def detect_keys(chroma_means, min_strength=None):
+    """Krumhansl-Schmuckler key estimates for a batch of chroma means.
+
+    All 24 rotated profiles are scored in one matrix product. Returns
+    ``(key_idx, confidence)`` arrays: ``KEY_NAMES[key_idx]`` is the key
+    (``key_idx % 12`` the tonic, ``key_idx >= 12`` minor) and confidence
+    is the margin between the best and runner-up correlation. Rows whose
+    strongest pitch class is at or below ``min_strength`` get -1.
+    """
+    chroma_means = np.atleast_2d(chroma_means)
+    scores = score_keys(chroma_means)
+    top2 = np.partition(scores, -2, axis=1)[:, -2:]
+    key_idx = np.argmax(scores, axis=1)
+    confidence = top2[:, 1] - top2[:, 0]
+    if min_strength is not None:
+        weak = chroma_means.max(axis=1) <= min_strength
+        key_idx = np.where(weak, -1, key_idx)
+        confidence = np.where(weak, 0.0, confidence)
+    return key_idx, confidence
+
+
+def key_name(key_idx):
+    return KEY_NAMES[key_idx] if key_idx >= 0 else "Unknown"
+
+
+def detect_key(chroma_mean, min_strength=None):
+    # Single-file form of detect_keys: (key name, mode, confidence)
+    key_idx, confidence = detect_keys(chroma_mean, min_strength)
+    key_idx = int(key_idx[0])
+    mode = None if key_idx < 0 else ("Minor" if key_idx >= 12 else "Major")
+    return key_name(key_idx), mode, float(confidence[0])
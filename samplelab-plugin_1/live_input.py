@@ -0,0 +1,388 @@
+import queue
+import sys
+import threading
+import time
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from key_detection import detect_key
+from streaming import TEMPOGRAM_WIN
+
+BLOCK_SIZE = 1024
+BUFFER_SECONDS = 30.0
+# Time constants of the decayed averages behind the running key and tempo
+KEY_MEMORY = 10.0
+TEMPO_MEMORY = 8.0
+# At most this many blocks are analyzed in one pass; older backlog is skipped
+MAX_BACKLOG = 16
+
+
+class RingBuffer:
+    """Fixed-size FIFO of the newest rows written, in one preallocated array.
+
+    Rows can be samples (``frame_shape=()``) or feature frames such as
+    12-bin chroma vectors. Writes overwrite the oldest rows; reads return
+    the newest ``n`` rows in order. Safe for one writer and many readers.
+    """
+
+    def __init__(self, capacity, frame_shape=(), dtype=np.float32):
+        self.data = np.zeros((capacity,) + tuple(frame_shape), dtype=dtype)
+        self.capacity = capacity
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def write(self, rows):
+        # Rows that would be overwritten straight away are counted, not copied
+        rows = np.asarray(rows, dtype=self.data.dtype)
+        written = len(rows)
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        with self._lock:
+            start = (self.total + written - n) % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = rows[:first]
+            self.data[:n - first] = rows[first:]
+            self.total += written
+
+    def latest(self, n=None):
+        with self._lock:
+            n = len(self) if n is None else min(n, len(self))
+            end = self.total % self.capacity
+            if n <= end:
+                return self.data[end - n:end].copy()
+            return np.concatenate([self.data[self.capacity - (n - end):], self.data[:end]])
+
+
+# --- Sources: start(callback) delivers mono float32 blocks, then None at the end.
+# A ``realtime`` source cannot wait for the analysis; the others are held back ---
+class FileSource:
+    """Plays an audio file into the live pipeline, as a stand-in for a sound card.
+
+    With ``realtime`` the blocks are paced at the file's own rate; without
+    it they arrive as fast as the analysis takes them, which is what
+    headless checks want.
+    """
+
+    def __init__(self, path, block_size=BLOCK_SIZE, realtime=True, loop=False):
+        self.path = path
+        self.block_size = block_size
+        self.realtime = realtime
+        self.loop = loop
+        self.sr = sf.info(path).samplerate
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, callback):
+        self._thread = threading.Thread(target=self._run, args=(callback,), daemon=True)
+        self._thread.start()
+
+    def _run(self, callback):
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            for block in sf.blocks(self.path, blocksize=self.block_size, dtype="float32",
+                                   always_2d=True):
+                if self._stop.is_set():
+                    break
+                callback(block.mean(axis=1))
+                if self.realtime:
+                    next_time += len(block) / self.sr
+                    time.sleep(max(next_time - time.perf_counter(), 0.0))
+            if not self.loop:
+                break
+        callback(None)
+
+    def stop(self):
+        self._stop.set()
+
+
+class PipeSource:
+    """Raw interleaved PCM from a binary stream, e.g. ``ffmpeg -f f32le -ac 1 -``.
+
+    Pass ``realtime=True`` when the writer cannot wait, e.g. a recorder.
+    """
+
+    def __init__(self, stream=None, sr=44100, channels=1, dtype="float32", block_size=BLOCK_SIZE,
+                 realtime=False):
+        self.stream = stream if stream is not None else sys.stdin.buffer
+        self.realtime = realtime
+        self.sr = sr
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.block_size = block_size
+        self._stop = threading.Event()
+
+    def start(self, callback):
+        threading.Thread(target=self._run, args=(callback,), daemon=True).start()
+
+    def _run(self, callback):
+        frame_bytes = self.channels * self.dtype.itemsize
+        # Integer PCM is scaled to [-1, 1) like soundfile does
+        scale = -1.0 / np.iinfo(self.dtype).min if self.dtype.kind == "i" else 1.0
+        while not self._stop.is_set():
+            data = self.stream.read(self.block_size * frame_bytes)
+            usable = len(data) - len(data) % frame_bytes
+            if usable == 0:
+                break
+            block = np.frombuffer(data[:usable], dtype=self.dtype).reshape(-1, self.channels)
+            callback((block.mean(axis=1) * scale).astype(np.float32))
+        callback(None)
+
+    def stop(self):
+        self._stop.set()
+
+
+class DeviceSource:
+    """Sound card input through the optional ``sounddevice`` package."""
+
+    realtime = True
+
+    def __init__(self, sr=44100, block_size=BLOCK_SIZE, device=None, channels=1):
+        self.sr = sr
+        self.block_size = block_size
+        self.device = device
+        self.channels = channels
+        self._stream = None
+
+    def start(self, callback):
+        import sounddevice
+
+        def on_audio(indata, frames, time_info, status):
+            # PortAudio's thread: copy out and return, the analysis runs elsewhere
+            callback(indata.mean(axis=1).astype(np.float32))
+
+        self._stream = sounddevice.InputStream(samplerate=self.sr, blocksize=self.block_size,
+                                               device=self.device, channels=self.channels,
+                                               dtype="float32", callback=on_audio)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+def default_source():
+    # The sound card if sounddevice and an input device are available, else None
+    try:
+        import sounddevice
+        sounddevice.query_devices(kind="input")
+    except (ImportError, OSError, ValueError):
+        return None
+    return DeviceSource()
+
+
+# --- Incremental analysis ---
+def _decay(memory, sr, hop_length):
+    return float(np.exp(-hop_length / (sr * memory)))
+
+
+class LiveAnalyzer:
+    """Onset strength, chroma, tempo and key updated block by block.
+
+    Frames are cut from the incoming samples without centering, as in
+    :func:`streaming.stream_analyze`, carrying the STFT overlap and the
+    previous mel frame across blocks. Key and tempo come from decayed
+    averages of chroma and tempogram columns (``KEY_MEMORY`` and
+    ``TEMPO_MEMORY`` seconds), so they follow the music as it changes.
+    Work per block is proportional to the frames it adds.
+    """
+
+    def __init__(self, sr, n_fft=2048, hop_length=512, n_mels=128, history_seconds=BUFFER_SECONDS,
+                 key_memory=KEY_MEMORY, tempo_memory=TEMPO_MEMORY):
+        self.sr = sr
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+        self.chroma_basis = librosa.filters.chroma(sr=sr, n_fft=n_fft)
+        self.key_decay = _decay(key_memory, sr, hop_length)
+        self.tempo_decay = _decay(tempo_memory, sr, hop_length)
+
+        history = int(history_seconds * sr / hop_length)
+        self.onset_history = RingBuffer(history)
+        self.chroma_history = RingBuffer(history, (12,))
+        self.n_frames = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._prev_mel = None
+        self._onset_tail = np.zeros(0, dtype=np.float32)
+        self._chroma_avg = np.zeros(12)
+        self._chroma_weight = 0.0
+        self._tempogram_avg = np.zeros(TEMPOGRAM_WIN)
+        self._tempogram_weight = 0.0
+        self.tempo = 0.0
+        self.key = "Unknown"
+        self.key_confidence = 0.0
+
+    @property
+    def time(self):
+        # End of the newest analyzed frame, in seconds of input
+        return (self.n_frames * self.hop_length + self.n_fft) / self.sr
+
+    def frame_times(self, n):
+        # Centre times of the newest n frames
+        first = self.n_frames - n
+        return (np.arange(first, self.n_frames) * self.hop_length + self.n_fft / 2) / self.sr
+
+    def skip(self, n_samples):
+        # Input that will never be analyzed: restart framing after the gap.
+        # The histories get filler rows (no onsets, NaN chroma) so each row
+        # stays at the frame time frame_times gives it
+        n = (len(self._pending) + n_samples) // self.hop_length
+        fill = min(n, self.onset_history.capacity)
+        self.onset_history.write(np.zeros(fill, dtype=np.float32))
+        self.chroma_history.write(np.full((fill, 12), np.nan, dtype=np.float32))
+        self.n_frames += n
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._prev_mel = None
+        self._onset_tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, block):
+        """Analyze new samples; returns the number of frames added."""
+        samples = np.concatenate([self._pending, np.asarray(block, dtype=np.float32)])
+        if len(samples) < self.n_fft:
+            self._pending = samples
+            return 0
+        n = 1 + (len(samples) - self.n_fft) // self.hop_length
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.n_fft)[::self.hop_length][:n]
+        self._pending = samples[n * self.hop_length:]
+        power = (np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2).T
+
+        # Onset strength: spectral flux on log-mel, continued from the last block
+        mel_db = librosa.power_to_db(self.mel_basis @ power, top_db=None)
+        previous = mel_db[:, :1] if self._prev_mel is None else self._prev_mel
+        onset = np.maximum(0.0, np.diff(np.hstack([previous, mel_db]), axis=1)).mean(axis=0)
+        self._prev_mel = mel_db[:, -1:]
+        self.onset_history.write(onset)
+
+        # Tempo: decayed tempogram over the new columns, with the last window as context
+        context = np.concatenate([self._onset_tail, onset.astype(np.float32)])
+        if len(context) >= TEMPOGRAM_WIN:
+            tg = librosa.feature.tempogram(onset_envelope=context, sr=self.sr,
+                                           hop_length=self.hop_length, win_length=TEMPOGRAM_WIN,
+                                           center=False)
+            self._tempogram_avg, self._tempogram_weight = self._accumulate(
+                self._tempogram_avg, self._tempogram_weight, tg, self.tempo_decay)
+            tg_mean = (self._tempogram_avg / self._tempogram_weight)[:, None]
+            try:
+                self.tempo = float(librosa.feature.rhythm.tempo(tg=tg_mean, sr=self.sr,
+                                                                hop_length=self.hop_length)[0])
+            except AttributeError:
+                self.tempo = float(librosa.beat.tempo(tg=tg_mean, sr=self.sr,
+                                                      hop_length=self.hop_length)[0])
+        self._onset_tail = context[-(TEMPOGRAM_WIN - 1):]
+
+        # Chroma and key
+        chroma = librosa.util.normalize(self.chroma_basis @ power, axis=0)
+        self.chroma_history.write(chroma.T)
+        self._chroma_avg, self._chroma_weight = self._accumulate(
+            self._chroma_avg, self._chroma_weight, chroma, self.key_decay)
+        self.key, _, self.key_confidence = detect_key(self._chroma_avg / self._chroma_weight,
+                                                      min_strength=0.45)
+        self.n_frames += n
+        return n
+
+    @staticmethod
+    def _accumulate(total, weight, columns, decay):
+        # Exponentially decayed sum: the newest column has weight 1
+        weights = decay ** np.arange(columns.shape[1] - 1, -1, -1)
+        scale = decay ** columns.shape[1]
+        return total * scale + columns @ weights, weight * scale + weights.sum()
+
+    def chroma_window(self, seconds):
+        # (chroma (12, n), times) of the newest frames covering ``seconds``
+        n = int(seconds * self.sr / self.hop_length)
+        chroma = self.chroma_history.latest(n).T
+        return chroma, self.frame_times(chroma.shape[1])
+
+
+class LiveSession:
+    """A source feeding a ring buffer and a :class:`LiveAnalyzer`.
+
+    The source's callback only copies the block into the ring buffer and
+    a queue, so a sound card thread is never held up by analysis. A
+    worker thread analyzes queued blocks; if a realtime source gets more
+    than ``max_backlog`` blocks ahead, the oldest are skipped so per-pass
+    latency stays bounded. Other sources wait for the worker instead, so
+    nothing is skipped. ``stats`` reports the last and worst pass in ms
+    and the blocks skipped.
+    """
+
+    def __init__(self, source, buffer_seconds=BUFFER_SECONDS, max_backlog=MAX_BACKLOG, **analyzer_args):
+        self.source = source
+        self.sr = source.sr
+        self.audio = RingBuffer(int(buffer_seconds * source.sr))
+        self.analyzer = LiveAnalyzer(source.sr, history_seconds=buffer_seconds, **analyzer_args)
+        self.max_backlog = max_backlog
+        self.stats = {"blocks": 0, "skipped": 0, "last_ms": 0.0, "max_ms": 0.0}
+        self.finished = threading.Event()
+        # A bounded queue makes a source that can wait block in its callback
+        self._blocks = queue.Queue(0 if source.realtime else max_backlog)
+        self._worker = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._worker.start()
+        self.source.start(self._on_block)
+        return self
+
+    def stop(self):
+        self.source.stop()
+        self._blocks.put(None)
+
+    def _on_block(self, block):
+        if block is not None:
+            self.audio.write(block)
+        self._blocks.put(block)
+
+    def _run(self):
+        while True:
+            blocks = [self._blocks.get()]
+            while True:
+                try:
+                    blocks.append(self._blocks.get_nowait())
+                except queue.Empty:
+                    break
+            # ``in`` would compare arrays elementwise; look for the end marker by identity
+            end = next((i for i, b in enumerate(blocks) if b is None), None)
+            done = end is not None
+            if done:
+                blocks = blocks[:end]
+            if self.source.realtime and len(blocks) > self.max_backlog:
+                skipped = blocks[:-self.max_backlog]
+                self.analyzer.skip(sum(len(b) for b in skipped))
+                self.stats["skipped"] += len(skipped)
+                blocks = blocks[-self.max_backlog:]
+            if blocks:
+                start = time.perf_counter()
+                self.analyzer.process(np.concatenate(blocks))
+                elapsed = (time.perf_counter() - start) * 1000
+                self.stats["blocks"] += len(blocks)
+                self.stats["last_ms"] = elapsed
+                self.stats["max_ms"] = max(self.stats["max_ms"], elapsed)
+            if done:
+                self.finished.set()
+                return
+
+    @property
+    def time(self):
+        # Seconds of input received so far
+        return self.audio.total / self.sr
+
+    def waveform(self, seconds, n_pixels):
+        # (times, mins, maxs) of the newest ``seconds`` of input, one column per pixel
+        y = self.audio.latest(int(seconds * self.sr))
+        end = self.audio.total
+        n_pixels = max(min(int(n_pixels), len(y)), 1)
+        if len(y) == 0:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+        edges = np.linspace(0, len(y), n_pixels + 1).astype(int)
+        lo = np.minimum.reduceat(y, edges[:-1])
+        hi = np.maximum.reduceat(y, edges[:-1])
+        centers = end - len(y) + (edges[:-1] + edges[1:]) / 2
+        return centers / self.sr, lo, hi
@@ -0,0 +1,44 @@
+import librosa
+import midiutil
+import numpy as np
+
+
+def chroma_note_runs(chroma, threshold=0.6):
+    """Runs of consecutive active frames per pitch class.
+
+    A cell is active when its frame-normalized chroma is above
+    ``threshold``. Returns ``(pitch_class, start_frame, end_frame)``
+    arrays with ``end_frame`` exclusive, one entry per sustained note.
+    """
+    active = librosa.util.normalize(chroma, axis=0) > threshold
+    padded = np.zeros((active.shape[0], active.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = active
+    edges = np.diff(padded, axis=1)
+    # Rising and falling edges come out row-major, so they pair up in order
+    pitch, start = np.nonzero(edges == 1)
+    _, end = np.nonzero(edges == -1)
+    return pitch, start, end
+
+
+def export_chord_midi(chroma, times, tempo, file_path, threshold=0.6, base_note=60, velocity=100):
+    # Sustained chroma notes as MIDI, timed in beats at the detected tempo; returns the note count
+    times = np.asarray(times, dtype=np.float64)
+    n_frames = min(chroma.shape[1], len(times))
+    tempo = float(tempo) if tempo and tempo > 0 else 120.0
+    midi = midiutil.MIDIFile(1)
+    midi.addTempo(0, 0, tempo)
+
+    pitch, start, end = chroma_note_runs(chroma[:, :n_frames], threshold)
+    if n_frames:
+        # Frame start times plus where the last frame ends
+        frame_step = times[n_frames - 1] - times[n_frames - 2] if n_frames > 1 else 0.0
+        edges = np.append(times[:n_frames], times[n_frames - 1] + frame_step)
+        beats_per_second = tempo / 60.0
+        onsets = edges[start] * beats_per_second
+        durations = (edges[end] - edges[start]) * beats_per_second
+        for p, onset, duration in zip((base_note + pitch).tolist(), onsets.tolist(), durations.tolist()):
+            midi.addNote(0, 0, p, onset, duration, velocity)
+
+    with open(file_path, "wb") as f:
+        midi.writeFile(f)
+    return len(pitch)
@@ -1,54 +1,171 @@
 import librosa
 import numpy as np
-from scipy.signal import find_peaks
+from analysis_cache import audio_hash, file_hash, get_cache
+from analysis_engine import load_graph
+from key_detection import detect_key
+from profiling import profiled, span
+from quality import TIERS
+from streaming import stream_analyze
 
-def analyze_audio(file_path):
+# Decode and analysis settings; both are part of the cache key.
+# The "precision" quality tier, limited to the first 15 seconds. With
+# stream=True the whole file is read block by block with the STREAM_*
+# settings instead, and cached under them.
+PRECISION = TIERS["precision"]
+DECODE_PARAMS = {"sr": PRECISION["sr"], "mono": True, "duration": 15}
+ANALYSIS_PARAMS = {
+    "hop_length": PRECISION["hop_length"], "margin": PRECISION["margin"],
+    "n_octaves": PRECISION["n_octaves"], "bins_per_octave": PRECISION["bins_per_octave"],
+    "threshold": PRECISION["threshold"], "tightness": PRECISION["tightness"],
+    "peak_distance": 32, "peak_prominence": 0.5, "n_mfcc": 13, "key_profiles": 24
+}
+
+STREAM_PARAMS = {"stream": True, "mono": True, "block_length": 256}
+STREAM_ANALYSIS_PARAMS = {"n_fft": 2048, "hop_length": 512, "n_mels": 128, "n_mfcc": 13,
+                          "keep_chroma": False}
+# A streamed result carries the chroma summary instead of the whole chromagram
+STREAM_RESULT_FIELDS = ("key", "key_confidence", "tempo", "beats", "transients",
+                        "chroma_mean", "chroma_std", "mfcc_mean", "mfcc_std")
+
+def _settings(stream):
+    return (STREAM_PARAMS, STREAM_ANALYSIS_PARAMS) if stream else (DECODE_PARAMS, ANALYSIS_PARAMS)
+
+def cached_result(file_path, stream=False):
+    # Stored analysis of an unchanged file, without decoding it; None if stale
+    decode, analysis = _settings(stream)
+    content_hash = get_cache().lookup_file(file_path, decode)
+    if content_hash is None:
+        return None
+    return get_cache().get(content_hash, dict(decode, **analysis))
+
+@profiled("analyze_audio")
+def analyze_audio(file_path, with_separation=True):
+    result, graph = _analyze_file(file_path, with_separation)
+
+    # --- Harmonic/Percussive Separation ---
+    if with_separation:
+        y_harmonic, y_percussive = graph.hpss(margin=ANALYSIS_PARAMS["margin"])
+    else:
+        y_harmonic, y_percussive = None, None
+
+    return _as_tuple(result, y_harmonic, y_percussive)
+
+@profiled("analyze_audio")
+def analyze_result(file_path, stream=False):
+    # The result dict (MFCC summary, ...) rather than the tuple; unlike a later
+    # cached_result it cannot have been evicted in between. stream=True
+    # analyzes the whole file in bounded memory; either way summarize_result
+    # gives the same fields
+    return _analyze_file(file_path, need_graph=False, stream=stream)[0]
+
+def _analyze_file(file_path, need_graph, stream=False):
+    # (result, graph); graph is None when the result came from the cache or
+    # the file was streamed, and the audio was never decoded as a whole
+    cache = get_cache()
+    params = dict(DECODE_PARAMS, **ANALYSIS_PARAMS)
+    
+    # Unchanged files that were analyzed before skip decoding entirely
+    with span("cache_lookup"):
+        result = cached_result(file_path, stream)
+    if result is not None and not need_graph:
+        return result, None
+    if stream:
+        return _analyze_stream(file_path), None
+    content_hash = cache.lookup_file(file_path, DECODE_PARAMS)
+    
     # Load audio with enhanced settings
-    y, sr = librosa.load(file_path, sr=44100, mono=True, duration=15)
+    graph = load_graph(file_path, **DECODE_PARAMS)
+    if content_hash is None:
+        with span("audio_hash"):
+            content_hash = audio_hash(graph.y, graph.sr)
+        cache.remember_file(file_path, DECODE_PARAMS, content_hash)
+        result = cache.get(content_hash, params)
+    
+    if result is None:
+        result = _analyze_graph(graph)
+        with span("cache_store"):
+            cache.put(content_hash, params, result)
+    return result, graph
+
+def _analyze_stream(file_path):
+    # The whole file, block by block at its native rate. Its bytes are
+    # hashed instead of its samples, which would mean decoding it all at once
+    cache = get_cache()
+    params = dict(STREAM_PARAMS, **STREAM_ANALYSIS_PARAMS)
+    with span("file_hash"):
+        content_hash = file_hash(file_path)
+    cache.remember_file(file_path, STREAM_PARAMS, content_hash)
+    result = cache.get(content_hash, params)
+    if result is None:
+        with span("stream_analyze"):
+            streamed = stream_analyze(file_path, block_length=STREAM_PARAMS["block_length"],
+                                      **STREAM_ANALYSIS_PARAMS)
+        result = {name: streamed[name] for name in STREAM_RESULT_FIELDS}
+        with span("cache_store"):
+            cache.put(content_hash, params, result)
+    return result
+
+def _analyze_graph(graph):
+    margin = ANALYSIS_PARAMS["margin"]
     
     # --- Key Detection ---
-    y_harmonic = librosa.effects.harmonic(y, margin=8.0)
-    chroma = librosa.feature.chroma_cqt(
-        y=y_harmonic, 
-        sr=sr,
-        n_chroma=12,
-        n_octaves=7,
-        tuning=librosa.pitch_tuning(y_harmonic),
-        bins_per_octave=48,
-        threshold=0.1
+    # One HPSS pass serves chroma, tuning and the returned stems
+    chroma = graph.chroma(
+        margin=margin,
+        hop_length=ANALYSIS_PARAMS["hop_length"],
+        n_octaves=ANALYSIS_PARAMS["n_octaves"],
+        tuning=graph.tuning(margin=margin),
+        bins_per_octave=ANALYSIS_PARAMS["bins_per_octave"],
+        threshold=ANALYSIS_PARAMS["threshold"]
     )
-    
-    # Key determination
-    chroma_mean = np.mean(chroma, axis=1)
-    key_index = np.argmax(chroma_mean)
-    key_mapping = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-    key_note = key_mapping[key_index]
-    
-    # Mode detection
-    major_profile = librosa.util.normalize([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
-    minor_profile = librosa.util.normalize([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
-    key_mode = "Minor" if np.dot(chroma_mean, minor_profile) > np.dot(chroma_mean, major_profile) else "Major"
-    key = f"{key_note} {key_mode}" if np.max(chroma_mean) > 0.45 else "Unknown"
+    key, _, key_confidence = detect_key(np.mean(chroma, axis=1), min_strength=0.45)
+    times = librosa.frames_to_time(range(chroma.shape[1]), sr=graph.sr,
+                                   hop_length=ANALYSIS_PARAMS["hop_length"])
 
     # --- Tempo/Beat Tracking ---
-    tempo, beats = librosa.beat.beat_track(y=y, sr=sr, units="time", tightness=150)
-    tempo = int(np.median(tempo)) if isinstance(tempo, np.ndarray) else int(tempo)
+    tempo = int(graph.tempo())
+    beats = graph.beats(tightness=ANALYSIS_PARAMS["tightness"])
     
     # --- Transient Detection ---
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    peaks = find_peaks(onset_env, distance=32, prominence=0.5)[0]
-    transients = librosa.frames_to_time(peaks, sr=sr).tolist()
+    # Reuses the onset envelope from beat tracking
+    transients = graph.transients(distance=ANALYSIS_PARAMS["peak_distance"],
+                                  prominence=ANALYSIS_PARAMS["peak_prominence"])
 
-    # --- Harmonic/Percussive Separation ---
-    y_harmonic = librosa.effects.harmonic(y, margin=8)
-    y_percussive = librosa.effects.percussive(y, margin=8)
+    # --- Timbre summary (used by similarity search) ---
+    mfcc = graph.mfcc(n_mfcc=ANALYSIS_PARAMS["n_mfcc"])
+
+    return {"key": key, "key_confidence": key_confidence, "tempo": tempo,
+            "chroma": chroma, "times": times,
+            "beats": beats, "transients": transients,
+            "mfcc_mean": mfcc.mean(axis=1), "mfcc_std": mfcc.std(axis=1)}
 
+def _as_tuple(result, y_harmonic, y_percussive):
     return (
-        key, 
-        tempo, 
-        chroma, 
-        beats.tolist(),
-        transients,
+        result["key"], 
+        int(result["tempo"]), 
+        result["chroma"], 
+        result["beats"].tolist(),
+        result["transients"].tolist(),
         y_harmonic,
         y_percussive
-    )
\ No newline at end of file
+    )
+
+def summarize_result(result):
+    # Fixed-size per-file summary for library tables and similarity search;
+    # streamed results already carry the chroma summary
+    if "chroma_mean" in result:
+        chroma_mean, chroma_std = result["chroma_mean"], result["chroma_std"]
+    else:
+        chroma = np.asarray(result["chroma"], dtype=np.float32)
+        chroma_mean, chroma_std = chroma.mean(axis=1), chroma.std(axis=1)
+    return {
+        "key": result["key"],
+        "key_confidence": float(result["key_confidence"]),
+        "tempo": float(result["tempo"]),
+        "beats": np.asarray(result["beats"], dtype=np.float32),
+        "transients": np.asarray(result["transients"], dtype=np.float32),
+        "chroma_mean": np.asarray(chroma_mean, dtype=np.float32),
+        "chroma_std": np.asarray(chroma_std, dtype=np.float32),
+        "mfcc_mean": np.asarray(result["mfcc_mean"], dtype=np.float32),
+        "mfcc_std": np.asarray(result["mfcc_std"], dtype=np.float32),
+    }
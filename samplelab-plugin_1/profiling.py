@@ -0,0 +1,154 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+# SAMPLELAB_PROFILE=1 turns spans on at import, =memory also tracks allocations
+_MODE = os.environ.get("SAMPLELAB_PROFILE", "").lower()
+_enabled = _MODE not in ("", "0", "false", "no")
+_memory = _MODE == "memory"
+_records = []
+_lock = threading.Lock()
+_origin_ns = time.perf_counter_ns()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start_ns", "mem_start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.mem_start = tracemalloc.get_traced_memory()[0] if _memory else None
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end_ns = time.perf_counter_ns()
+        record = {"name": self.name, "start_ns": self.start_ns - _origin_ns,
+                  "duration_ns": end_ns - self.start_ns, "thread": threading.get_ident()}
+        if self.mem_start is not None:
+            record["mem_delta"] = tracemalloc.get_traced_memory()[0] - self.mem_start
+        if self.args:
+            record["args"] = self.args
+        with _lock:
+            _records.append(record)
+        return False
+
+
+def span(name, **args):
+    """Time a block: ``with span("hpss"): ...``.
+
+    Returns a shared no-op context manager while profiling is off, so
+    instrumented code pays one function call and a flag check.
+    """
+    if not _enabled:
+        return _NOOP
+    return _Span(name, args)
+
+
+def profiled(name):
+    # Decorator form of span for whole functions
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(memory=False):
+    global _enabled, _memory
+    _enabled = True
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _memory
+    _enabled = False
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def clear():
+    with _lock:
+        _records.clear()
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+def summary():
+    # Per span name in first-seen order: calls, total and self ms (total minus
+    # nested spans on the same thread) and the summed memory delta in MB
+    totals = OrderedDict()
+    stack = []
+    for record in sorted(records(), key=lambda r: (r["thread"], r["start_ns"], -r["duration_ns"])):
+        while stack and (stack[-1][0]["thread"] != record["thread"] or
+                         stack[-1][0]["start_ns"] + stack[-1][0]["duration_ns"] <= record["start_ns"]):
+            stack.pop()
+        if stack:
+            stack[-1][1]["self_ms"] -= record["duration_ns"] / 1e6
+        entry = totals.setdefault(record["name"], {"count": 0, "total_ms": 0.0, "self_ms": 0.0,
+                                                   "mem_mb": None, "first_ns": record["start_ns"]})
+        entry["first_ns"] = min(entry["first_ns"], record["start_ns"])
+        entry["count"] += 1
+        entry["total_ms"] += record["duration_ns"] / 1e6
+        entry["self_ms"] += record["duration_ns"] / 1e6
+        if "mem_delta" in record:
+            entry["mem_mb"] = (entry["mem_mb"] or 0.0) + record["mem_delta"] / 2 ** 20
+        stack.append((record, entry))
+    return OrderedDict(sorted(totals.items(), key=lambda item: item[1]["first_ns"]))
+
+
+def format_summary():
+    lines = [f"{'stage':<24} {'calls':>5} {'total ms':>10} {'self ms':>10} {'mem MB':>8}"]
+    for name, entry in summary().items():
+        mem = f"{entry['mem_mb']:>8.1f}" if entry["mem_mb"] is not None else f"{'-':>8}"
+        lines.append(f"{name:<24} {entry['count']:>5} {entry['total_ms']:>10.1f} "
+                     f"{entry['self_ms']:>10.1f} {mem}")
+    return "\n".join(lines)
+
+
+def export_chrome_trace(path):
+    # Complete ("X") events, loadable in chrome://tracing or Perfetto
+    events = []
+    for record in records():
+        args = dict(record.get("args", {}))
+        if "mem_delta" in record:
+            args["mem_delta_mb"] = round(record["mem_delta"] / 2 ** 20, 3)
+        events.append({"name": record["name"], "cat": "samplelab", "ph": "X",
+                       "ts": record["start_ns"] / 1000, "dur": record["duration_ns"] / 1000,
+                       "pid": os.getpid(), "tid": record["thread"], "args": args})
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
+
+
+if _memory:
+    tracemalloc.start()
@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+import time
+
+import librosa
+import numpy as np
+
+from analysis_cache import audio_hash, get_cache
+from analysis_engine import HOP_LENGTH, clear_graphs, load_graph
+from key_detection import detect_key
+
+# Named analysis settings, cheapest first. margin=None skips HPSS and takes
+# chroma straight from the STFT; duration=None analyzes the whole file.
+TIERS = {
+    "preview": {
+        "sr": 11025, "duration": 30, "margin": None, "hop_length": HOP_LENGTH,
+        "tightness": 100,
+    },
+    "standard": {
+        "sr": 22050, "duration": None, "margin": 4, "hop_length": 2048,
+        "n_octaves": 6, "bins_per_octave": 36, "tuning": False, "threshold": 0.0,
+        "tightness": 100,
+    },
+    "precision": {
+        "sr": 44100, "duration": None, "margin": 8.0, "hop_length": 512,
+        "n_octaves": 7, "bins_per_octave": 48, "tuning": True, "threshold": 0.1,
+        "tightness": 150,
+    },
+}
+TIER_NAMES = list(TIERS)
+
+
+def tier_params(tier):
+    if tier not in TIERS:
+        raise ValueError(f"Unknown quality tier {tier!r}; expected one of {', '.join(TIER_NAMES)}")
+    return dict(TIERS[tier])
+
+
+def load_tier_graph(file_path, tier):
+    params = tier_params(tier)
+    return load_graph(file_path, sr=params["sr"], mono=True, duration=params["duration"])
+
+
+def rhythm(graph, tier):
+    params = tier_params(tier)
+    return {"tempo": graph.tempo(), "beats": graph.beats(tightness=params["tightness"]),
+            "transients": graph.transients()}
+
+
+def harmony(graph, tier):
+    params = tier_params(tier)
+    if params["margin"] is None:
+        chroma = graph.chroma_stft()
+        hop_length = HOP_LENGTH
+    else:
+        hop_length = params["hop_length"]
+        chroma = graph.chroma(
+            margin=params["margin"], hop_length=hop_length,
+            n_octaves=params["n_octaves"], bins_per_octave=params["bins_per_octave"],
+            tuning=graph.tuning(params["margin"]) if params["tuning"] else None,
+            threshold=params["threshold"]
+        )
+    times = librosa.frames_to_time(np.arange(chroma.shape[1]), sr=graph.sr, hop_length=hop_length)
+    key, _, key_confidence = detect_key(np.mean(chroma, axis=1), min_strength=0.45)
+    return {"chroma": chroma, "times": times, "key": key, "key_confidence": key_confidence}
+
+
+def _decode_params(params):
+    return {"sr": params["sr"], "mono": True, "duration": params["duration"]}
+
+
+def cached_result(file_path, tier, graph=None):
+    # Stored result for this file and tier, or None. Without a graph only files the
+    # cache has seen are found; with one, new files are hashed and remembered.
+    params = tier_params(tier)
+    cache = get_cache()
+    content_hash = cache.lookup_file(file_path, _decode_params(params))
+    if content_hash is None:
+        if graph is None:
+            return None
+        content_hash = audio_hash(graph.y, graph.sr)
+        cache.remember_file(file_path, _decode_params(params), content_hash)
+    return cache.get(content_hash, dict(params, tier=tier))
+
+
+def store_result(file_path, tier, graph, result):
+    params = tier_params(tier)
+    cache = get_cache()
+    content_hash = cache.lookup_file(file_path, _decode_params(params))
+    if content_hash is None:
+        content_hash = audio_hash(graph.y, graph.sr)
+        cache.remember_file(file_path, _decode_params(params), content_hash)
+    cache.put(content_hash, dict(params, tier=tier), result)
+
+
+def analyze(file_path, tier="standard", use_cache=True):
+    """Key, tempo, beats, transients and chroma of a file at a quality tier.
+
+    Results are cached per tier, so asking for a cheaper tier never
+    returns a result computed with different settings.
+    """
+    if use_cache:
+        result = cached_result(file_path, tier)
+        if result is not None:
+            return result
+    graph = load_tier_graph(file_path, tier)
+    if use_cache:
+        result = cached_result(file_path, tier, graph)
+        if result is not None:
+            return result
+    result = dict(rhythm(graph, tier), **harmony(graph, tier))
+    if use_cache:
+        store_result(file_path, tier, graph, result)
+    return result
+
+
+def _tempo_matches(estimate, reference, tolerance=0.04, octaves=False):
+    candidates = [reference, reference / 2, reference * 2] if octaves else [reference]
+    return any(abs(estimate - c) <= tolerance * c for c in candidates)
+
+
+def evaluate(reference_dir, tiers=TIER_NAMES):
+    """Time each tier on a reference set and score it against the known answers.
+
+    ``reference_dir`` holds audio files plus a ``reference.json`` mapping
+    file names to ``{"key": ..., "tempo": ...}``, as written by
+    ``create_test_samples.write_reference_set``. Returns one row per tier
+    with mean/max seconds per file, key accuracy, and tempo accuracy
+    both strict (within 4 %) and allowing half/double tempo.
+    """
+    with open(os.path.join(reference_dir, "reference.json")) as f:
+        reference = json.load(f)
+    paths = [os.path.join(reference_dir, name) for name in sorted(reference)]
+
+    rows = []
+    for tier in tiers:
+        # Warm up librosa's JIT-compiled kernels so the first file is not penalised
+        analyze(paths[0], tier, use_cache=False)
+        seconds, keys, tempos, tempos_octave = [], [], [], []
+        for path in paths:
+            expected = reference[os.path.basename(path)]
+            # A fresh graph per file; the warm-up must not serve as a cached result
+            clear_graphs()
+            start = time.perf_counter()
+            result = analyze(path, tier, use_cache=False)
+            seconds.append(time.perf_counter() - start)
+            keys.append(result["key"] == expected["key"])
+            tempos.append(_tempo_matches(float(result["tempo"]), expected["tempo"]))
+            tempos_octave.append(_tempo_matches(float(result["tempo"]), expected["tempo"], octaves=True))
+        rows.append({"tier": tier, "files": len(paths),
+                     "mean_seconds": float(np.mean(seconds)), "max_seconds": float(np.max(seconds)),
+                     "key_accuracy": float(np.mean(keys)), "tempo_accuracy": float(np.mean(tempos)),
+                     "tempo_accuracy_octave": float(np.mean(tempos_octave))})
+    return rows
+
+
+def print_evaluation(rows):
+    print(f"{'tier':<10} {'files':>5} {'mean s':>8} {'max s':>8} {'key':>6} {'tempo':>6} {'tempo*':>7}")
+    for row in rows:
+        print(f"{row['tier']:<10} {row['files']:>5} {row['mean_seconds']:>8.3f} {row['max_seconds']:>8.3f} "
+              f"{row['key_accuracy']:>6.0%} {row['tempo_accuracy']:>6.0%} {row['tempo_accuracy_octave']:>7.0%}")
+    print("tempo* counts half/double tempo as correct")
+
+
+if __name__ == "__main__":
+    reference_dir = sys.argv[1] if len(sys.argv) > 1 else "reference_samples"
+    if not os.path.exists(os.path.join(reference_dir, "reference.json")):
+        from create_test_samples import write_reference_set
+        write_reference_set(reference_dir)
+    print_evaluation(evaluate(reference_dir))
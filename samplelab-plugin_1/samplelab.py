@@ -0,0 +1,307 @@
+import argparse
+import csv
+import io
+import os
+import sqlite3
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from analysis_cache import CACHE_DIR
+from key_detection import KEY_MAPPING, detect_keys, key_name
+from similarity import INDEX_DIR, SimilarityIndex, build_library_index
+import warmup
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".aiff", ".aif", ".ogg")
+PROGRESS_PATH = os.path.join(CACHE_DIR, "library.sqlite")
+
+
+def find_audio_files(root, extensions=AUDIO_EXTENSIONS):
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(extensions):
+                paths.append(os.path.join(dirpath, name))
+    return paths
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class LibraryProgress:
+    """Summaries of every file a library scan has finished, keyed on (path, size, mtime).
+
+    The analysis cache evicts old entries once it is full, so on its own it
+    cannot tell a re-run which files are done. Nothing here is ever evicted:
+    a re-run, or a scan resumed after a crash, only analyzes files that are
+    new, changed or failed last time. Each summary is committed as soon as
+    its file is done. Streamed summaries are kept in a table of their own.
+    """
+
+    def __init__(self, path=PROGRESS_PATH, stream=False):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._table = "stream_summaries" if stream else "summaries"
+        self._db = sqlite3.connect(path, timeout=30)
+        with self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("
+                " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, summary BLOB)"
+            )
+
+    def get(self, path, signature):
+        row = self._db.execute(
+            f"SELECT summary FROM {self._table} WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, *signature)).fetchone()
+        if row is None:
+            return None
+        with np.load(io.BytesIO(row[0]), allow_pickle=False) as data:
+            summary = {name: data[name] for name in data.files}
+        summary["key"] = str(summary["key"])
+        summary["key_confidence"] = float(summary["key_confidence"])
+        summary["tempo"] = float(summary["tempo"])
+        return summary
+
+    def put(self, path, signature, summary):
+        blob = io.BytesIO()
+        np.savez(blob, **summary)
+        with self._db:
+            self._db.execute(f"INSERT OR REPLACE INTO {self._table} VALUES (?, ?, ?, ?)",
+                             (path, *signature, blob.getvalue()))
+
+    def close(self):
+        self._db.close()
+
+
+def _init_worker():
+    warnings.filterwarnings("ignore")
+    warmup.configure_jit_cache()
+
+
+def _analyze_file(path, stream=False):
+    # Runs in a worker process; the result also lands in the shared analysis cache
+    import process_audio
+    try:
+        summary = process_audio.summarize_result(process_audio.analyze_result(path, stream))
+        return path, summary, None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def analyze_library(root, workers=None, on_progress=None, progress_path=PROGRESS_PATH,
+                    stream=False):
+    """Analyze every audio file under ``root`` on a process pool.
+
+    Files whose summary is already in the :class:`LibraryProgress` table at
+    ``progress_path`` and unchanged since are not re-analyzed, and every
+    finished file is recorded there right away, so an interrupted scan
+    resumes where it stopped. With ``stream`` whole files are analyzed block
+    by block instead of their first 15 seconds; the summaries have the same
+    fields. Returns ``{path: summary}`` and ``{path: error}``.
+    """
+    paths = find_audio_files(root)
+    results, errors, pending = {}, {}, {}
+    progress = LibraryProgress(progress_path, stream)
+    try:
+        for path in paths:
+            try:
+                signature = file_signature(path)
+            except OSError as e:
+                errors[path] = f"{type(e).__name__}: {e}"
+                continue
+            summary = progress.get(path, signature)
+            if summary is not None:
+                results[path] = summary
+            else:
+                pending[path] = signature
+
+        done = len(results) + len(errors)
+        if on_progress:
+            on_progress(done, len(paths), len(results))
+        if pending:
+            _analyze_pending(pending, results, errors, progress, done, len(paths), workers,
+                             on_progress, stream)
+    finally:
+        progress.close()
+    score_keys(results)
+    return results, errors
+
+
+def _analyze_pending(pending, results, errors, progress, done, total, workers, on_progress,
+                     stream):
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        # Keep a bounded number of files in flight instead of one future per file
+        queue = iter(pending)
+        in_flight = set()
+        for path in queue:
+            in_flight.add(pool.submit(_analyze_file, path, stream))
+            if len(in_flight) >= workers * 4:
+                break
+        while in_flight:
+            future = next(as_completed(in_flight))
+            in_flight.remove(future)
+            path, summary, error = future.result()
+            if error is None:
+                results[path] = summary
+                progress.put(path, pending[path], summary)
+            else:
+                errors[path] = error
+            done += 1
+            if on_progress:
+                on_progress(done, total, len(results))
+            next_path = next(queue, None)
+            if next_path is not None:
+                in_flight.add(pool.submit(_analyze_file, next_path, stream))
+
+
+def score_keys(results):
+    # Key and confidence of every summary from one batched product over the chroma means
+    if not results:
+        return
+    paths = list(results)
+    key_idx, confidence = detect_keys(np.stack([results[p]["chroma_mean"] for p in paths]),
+                                      min_strength=0.45)
+    for path, idx, conf in zip(paths, key_idx, confidence):
+        results[path]["key"] = key_name(idx)
+        results[path]["key_confidence"] = float(conf)
+
+
+def write_results(results, errors, output_path):
+    # One row per file; .npz keeps the beat and transient arrays, .csv only counts
+    paths = sorted(set(results) | set(errors))
+    if output_path.endswith(".npz"):
+        rows = [results.get(p) for p in paths]
+        beats = [r["beats"] if r else np.zeros(0, dtype=np.float32) for r in rows]
+        transients = [r["transients"] if r else np.zeros(0, dtype=np.float32) for r in rows]
+        np.savez(
+            output_path,
+            path=np.array(paths),
+            key=np.array([r["key"] if r else "" for r in rows]),
+            key_confidence=np.array([r["key_confidence"] if r else np.nan for r in rows], dtype=np.float32),
+            tempo=np.array([r["tempo"] if r else np.nan for r in rows], dtype=np.float32),
+            chroma_mean=np.array([r["chroma_mean"] if r else np.full(12, np.nan) for r in rows],
+                                 dtype=np.float32).reshape(len(rows), 12),
+            beats=np.concatenate(beats) if beats else np.zeros(0, dtype=np.float32),
+            beats_offsets=np.cumsum([0] + [len(b) for b in beats]),
+            transients=np.concatenate(transients) if transients else np.zeros(0, dtype=np.float32),
+            transients_offsets=np.cumsum([0] + [len(t) for t in transients]),
+            error=np.array([errors.get(p, "") for p in paths]),
+        )
+        return
+
+    with open(output_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "key", "key_confidence", "tempo", "n_beats", "n_transients"]
+                        + [f"chroma_{note}" for note in KEY_MAPPING] + ["error"])
+        for path in paths:
+            r = results.get(path)
+            if r is None:
+                writer.writerow([path, "", "", "", "", ""] + [""] * 12 + [errors[path]])
+            else:
+                writer.writerow([path, r["key"], f"{r['key_confidence']:.3f}", f"{r['tempo']:.2f}",
+                                 len(r["beats"]), len(r["transients"])]
+                                + [f"{v:.4f}" for v in r["chroma_mean"]] + [""])
+
+
+def cmd_analyze(args):
+    start = time.time()
+
+    def progress(done, total, ok):
+        if done and (done == total or done % 50 == 0):
+            rate = done / max(time.time() - start, 1e-9)
+            print(f"[{done}/{total}] {ok} analyzed, {rate:.1f} files/s", flush=True)
+
+    results, errors = analyze_library(args.directory, workers=args.workers, on_progress=progress,
+                                      progress_path=args.progress, stream=args.stream)
+    write_results(results, errors, args.output)
+    print(f"Wrote {len(results)} results ({len(errors)} errors) to {args.output}")
+    for path, error in sorted(errors.items()):
+        print(f"  {path}: {error}", file=sys.stderr)
+
+
+def cmd_index(args):
+    start = time.time()
+
+    def progress(done, total, ok):
+        if done and (done == total or done % 50 == 0):
+            print(f"[{done}/{total}] {ok} analyzed", flush=True)
+
+    index, errors = build_library_index(args.directory, args.index, workers=args.workers,
+                                        on_progress=progress)
+    print(f"Indexed {len(index)} samples ({len(errors)} errors) in {args.index} "
+          f"in {time.time() - start:.1f} s")
+
+
+def cmd_similar(args):
+    index = SimilarityIndex(args.index)
+    start = time.perf_counter()
+    try:
+        matches = index.similar_to(args.file, k=args.k)
+    except Exception as e:
+        sys.exit(f"{args.file}: {type(e).__name__}: {e}")
+    elapsed = (time.perf_counter() - start) * 1000
+    for path, score in matches:
+        print(f"{score:6.3f}  {path}")
+    print(f"{len(matches)} matches from {len(index)} samples in {elapsed:.1f} ms", file=sys.stderr)
+
+
+def cmd_thumbnails(args):
+    from generate_thumbnails import build_thumbnails, print_report
+    print_report(build_thumbnails(args.src, args.out, workers=args.workers,
+                                  force=args.force, use_hash=args.hash))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="samplelab", description="SampleLab Pro command line tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    analyze = commands.add_parser("analyze", help="analyze a sample library (key, tempo, beats, transients)")
+    analyze.add_argument("directory")
+    analyze.add_argument("-j", "--workers", type=int, default=None,
+                         help="worker processes (default: CPU count)")
+    analyze.add_argument("-o", "--output", default="library_analysis.csv",
+                         help="results file, .csv or .npz")
+    analyze.add_argument("--progress", default=PROGRESS_PATH,
+                         help="table of finished files, used to resume (default: %(default)s)")
+    analyze.add_argument("--stream", action="store_true",
+                         help="analyze whole files block by block instead of their first 15 s")
+    analyze.set_defaults(func=cmd_analyze)
+
+    index = commands.add_parser("index", help="build the similarity index for a sample library")
+    index.add_argument("directory")
+    index.add_argument("-j", "--workers", type=int, default=None)
+    index.add_argument("--index", default=INDEX_DIR, help="index directory (default: %(default)s)")
+    index.set_defaults(func=cmd_index)
+
+    similar = commands.add_parser("similar", help="list the indexed samples closest to a file")
+    similar.add_argument("file")
+    similar.add_argument("-k", type=int, default=10, help="number of matches")
+    similar.add_argument("--index", default=INDEX_DIR)
+    similar.set_defaults(func=cmd_similar)
+
+    thumbnails = commands.add_parser("thumbnails", help="render waveform thumbnails for new or changed files")
+    thumbnails.add_argument("--src", default="sample_database")
+    thumbnails.add_argument("--out", default="thumbnails")
+    thumbnails.add_argument("-j", "--workers", type=int, default=None)
+    thumbnails.add_argument("--force", action="store_true", help="rebuild every thumbnail")
+    thumbnails.add_argument("--hash", action="store_true", help="detect changes by content hash")
+    thumbnails.set_defaults(func=cmd_thumbnails)
+
+    import server
+    serve = commands.add_parser("serve", help="run the headless HTTP analysis server")
+    server.add_arguments(serve)
+    serve.set_defaults(func=server.run)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
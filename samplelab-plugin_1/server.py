@@ -0,0 +1,369 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+
+import numpy as np
+
+import warmup
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE = 32
+DEFAULT_CHOP_INTERVAL = 4
+MAX_BODY = 1 << 20
+HEADER_TIMEOUT = 30
+
+
+class RequestError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+# --- Worker-process jobs: module level so the pool can pickle them ---
+def _init_worker():
+    warnings.filterwarnings("ignore")
+    warmup.configure_jit_cache()
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    return value
+
+
+def analyze_job(path, tier=None):
+    # Default settings go through process_audio, so results are shared with the CLI
+    if tier is None:
+        import process_audio
+        return _jsonable(process_audio.summarize_result(process_audio.analyze_result(path)))
+    import quality
+    result = quality.analyze(path, tier)
+    return _jsonable({"key": result["key"], "key_confidence": float(result["key_confidence"]),
+                      "tempo": float(result["tempo"]), "beats": result["beats"],
+                      "transients": result["transients"],
+                      "chroma_mean": np.mean(result["chroma"], axis=1)})
+
+
+def chop_job(path, interval=DEFAULT_CHOP_INTERVAL, tier=None):
+    # Same rule as the GUI's Generate Chops: every interval-th beat starts a chop
+    beats = analyze_job(path, tier)["beats"]
+    return {"beats": beats, "chop_points": beats[::interval]}
+
+
+def export_job(path, out_dir, fmt="wav", bit_depth=None, chop_points=None,
+               interval=DEFAULT_CHOP_INTERVAL, tier=None):
+    from chop_export import export_file_chops
+    chops = chop_job(path, interval, tier)
+    if chop_points is None:
+        chop_points = chops["chop_points"]
+    os.makedirs(out_dir, exist_ok=True)
+    base_path = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+    manifest_path = export_file_chops(path, chop_points, base_path, fmt=fmt,
+                                      bit_depth=bit_depth, beats=chops["beats"], workers=1)
+    with open(manifest_path) as f:
+        return {"manifest": manifest_path, **json.load(f)}
+
+
+# --- HTTP front end ---
+class AnalysisServer:
+    """JSON-over-HTTP front end to the analysis code, for headless render boxes.
+
+    Requests are served on an asyncio loop and the work runs on a process
+    pool. At most ``workers`` jobs run at once; up to ``max_queue`` more
+    wait their turn and anything beyond that is turned away with 503 and
+    ``Retry-After``, so a burst never piles up unbounded work. Identical
+    analyze/chop requests for an unchanged file are answered from an LRU
+    of ``cache_size`` results, and concurrent duplicates share one job.
+    Only files under ``root`` (the working directory unless given) are
+    read, and exports are only written below it.
+
+    Endpoints: ``GET /health``, ``GET /status``, ``POST /analyze``,
+    ``POST /chop`` and ``POST /export``.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None,
+                 max_queue=DEFAULT_QUEUE, cache_size=256, root=None):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.cache_size = cache_size
+        self.root = os.path.realpath(root or os.getcwd())
+        self.pool = None
+        self.server = None
+        self._slots = None
+        self._results = OrderedDict()
+        self._in_flight = {}
+        self.stats = {"running": 0, "queued": 0, "completed": 0, "failed": 0,
+                      "rejected": 0, "cache_hits": 0}
+
+    async def start(self):
+        # Returns the bound port, which matters when port=0 picked a free one
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._slots = asyncio.Semaphore(self.workers)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Job scheduling ---
+    async def run_job(self, func, *args, cache_key=None):
+        if cache_key is not None:
+            if cache_key in self._results:
+                self._results.move_to_end(cache_key)
+                self.stats["cache_hits"] += 1
+                return self._results[cache_key]
+            if cache_key in self._in_flight:
+                return await asyncio.shield(self._in_flight[cache_key])
+        if self.stats["running"] + self.stats["queued"] >= self.workers + self.max_queue:
+            self.stats["rejected"] += 1
+            raise RequestError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy, retry later",
+                               {"Retry-After": "1"})
+
+        task = asyncio.ensure_future(self._run(func, args))
+        if cache_key is not None:
+            self._in_flight[cache_key] = task
+        try:
+            result = await asyncio.shield(task)
+        finally:
+            self._in_flight.pop(cache_key, None)
+        if cache_key is not None and self.cache_size:
+            self._results[cache_key] = result
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    async def _run(self, func, args):
+        self.stats["queued"] += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.stats["queued"] -= 1
+        self.stats["running"] += 1
+        pool = self.pool
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+            self.stats["completed"] += 1
+            return result
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); later jobs get a fresh pool.
+            # Every job on the broken pool fails at once, but only the first
+            # replaces it: this runs on the event loop, so the check and swap
+            # cannot interleave with another job's
+            self.stats["failed"] += 1
+            if self.pool is pool:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+                pool.shutdown(wait=False, cancel_futures=True)
+            raise RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, "Worker process died")
+        except (OSError, ValueError, EOFError) as e:
+            self.stats["failed"] += 1
+            raise RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            self.stats["failed"] += 1
+            raise RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+        finally:
+            self.stats["running"] -= 1
+            self._slots.release()
+
+    # --- Request validation ---
+    def _allowed(self, path):
+        path = os.path.realpath(path)
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise RequestError(HTTPStatus.FORBIDDEN, f"{path} is outside the served directory")
+        return path
+
+    def _audio_path(self, body):
+        path = body.get("path")
+        if not isinstance(path, str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'path' is required")
+        path = self._allowed(path)
+        if not os.path.isfile(path):
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No such file: {path}")
+        return path
+
+    def _tier(self, body):
+        tier = body.get("tier")
+        if tier is not None:
+            import quality
+            if tier not in quality.TIERS:
+                raise RequestError(HTTPStatus.BAD_REQUEST,
+                                   f"Unknown tier {tier!r}; expected one of {', '.join(quality.TIER_NAMES)}")
+        return tier
+
+    def _interval(self, body):
+        interval = body.get("interval", DEFAULT_CHOP_INTERVAL)
+        if not isinstance(interval, int) or interval < 1:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'interval' must be a positive integer")
+        return interval
+
+    @staticmethod
+    def _file_key(path):
+        # Results are keyed on the file's identity, so an edited file is re-analyzed
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    # --- Endpoints ---
+    async def analyze(self, body):
+        path, tier = self._audio_path(body), self._tier(body)
+        return await self.run_job(analyze_job, path, tier,
+                                  cache_key=("analyze", self._file_key(path), tier))
+
+    async def chop(self, body):
+        path, tier, interval = self._audio_path(body), self._tier(body), self._interval(body)
+        return await self.run_job(chop_job, path, interval, tier,
+                                  cache_key=("chop", self._file_key(path), tier, interval))
+
+    async def export(self, body):
+        path, tier, interval = self._audio_path(body), self._tier(body), self._interval(body)
+        out_dir = body.get("out_dir") or os.path.join(os.path.dirname(path), "chops output")
+        if not isinstance(out_dir, str):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'out_dir' must be a path")
+        # Chops are only ever written below the served directory
+        out_dir = self._allowed(out_dir)
+        fmt = body.get("format", "wav")
+        bit_depth = body.get("bit_depth")
+        chop_points = body.get("chop_points")
+        if chop_points is not None and (not isinstance(chop_points, list) or
+                                        not all(isinstance(t, (int, float)) for t in chop_points)):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "'chop_points' must be a list of seconds")
+        # Exports write files, so every request runs even if it repeats an earlier one
+        return await self.run_job(export_job, path, out_dir, fmt, bit_depth, chop_points,
+                                  interval, tier)
+
+    def status(self):
+        return dict(self.stats, workers=self.workers, max_queue=self.max_queue,
+                    cached_results=len(self._results))
+
+    async def dispatch(self, method, target, body):
+        route = target.split("?", 1)[0].rstrip("/") or "/"
+        if route == "/health" and method == "GET":
+            return {"status": "ok"}
+        if route == "/status" and method == "GET":
+            return self.status()
+        handlers = {"/analyze": self.analyze, "/chop": self.chop, "/export": self.export}
+        if route not in handlers and route not in ("/health", "/status"):
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No endpoint {route}")
+        if route not in handlers or method != "POST":
+            raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed on {route}")
+        try:
+            body = json.loads(body or b"{}")
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+        if not isinstance(body, dict):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return await handlers[route](body)
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split()
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Bad Content-Length")
+        if length > MAX_BODY:
+            raise RequestError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, body
+
+    async def handle(self, reader, writer):
+        # One request per connection; the response always closes it
+        headers = {}
+        try:
+            try:
+                request = await asyncio.wait_for(self.read_request(reader), HEADER_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                return
+            if request is None:
+                return
+            status, payload = HTTPStatus.OK, await self.dispatch(*request)
+        except RequestError as e:
+            status, payload, headers = e.status, {"error": str(e)}, e.headers
+        except Exception as e:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+        try:
+            data = json.dumps(payload).encode()
+            head = [f"HTTP/1.1 {status.value} {status.phrase}", "Content-Type: application/json",
+                    f"Content-Length: {len(data)}", "Connection: close"]
+            head += [f"{name}: {value}" for name, value in headers.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, max_queue=DEFAULT_QUEUE,
+                cache_size=256, root=None):
+    server = AnalysisServer(host, port, workers, max_queue, cache_size, root)
+    await server.start()
+    print(f"SampleLab analysis server on http://{server.host}:{server.port} "
+          f"({server.workers} workers, queue {server.max_queue})", flush=True)
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    serving = asyncio.ensure_future(server.serve_forever())
+    await stop.wait()
+    serving.cancel()
+    await server.close()
+
+
+def add_arguments(parser):
+    parser.add_argument("--host", default=DEFAULT_HOST, help="interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--queue", type=int, default=DEFAULT_QUEUE,
+                        help="requests allowed to wait for a worker before 503s")
+    parser.add_argument("--cache-size", type=int, default=256, help="results kept in memory")
+    parser.add_argument("--root", default=None,
+                        help="only read and export files under this directory (default: the working directory)")
+
+
+def run(args):
+    asyncio.run(serve(args.host, args.port, args.workers, args.queue, args.cache_size, args.root))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless SampleLab analysis server")
+    add_arguments(parser)
+    run(parser.parse_args())
@@ -0,0 +1,124 @@
+import json
+import os
+
+import numpy as np
+
+INDEX_DIR = os.environ.get("SAMPLELAB_INDEX_DIR", "sample_index")
+EMBEDDING_DIM = 12 + 12 + 13 + 13 + 3
+
+
+def embed(summary):
+    """Fixed-length feature vector of one analysis summary.
+
+    Chroma profile (peak-normalized) and spread, MFCC mean and spread, and
+    tempo as log2(bpm / 120) plus its position on the tempo octave circle,
+    so 60, 120 and 240 BPM land close together.
+    """
+    chroma_mean = np.asarray(summary["chroma_mean"], dtype=np.float32)
+    peak = chroma_mean.max()
+    if peak > 0:
+        chroma_mean = chroma_mean / peak
+    octave = np.log2(max(float(summary["tempo"]), 1.0) / 120.0)
+    angle = 2 * np.pi * octave
+    return np.concatenate([
+        chroma_mean,
+        np.asarray(summary["chroma_std"], dtype=np.float32),
+        np.asarray(summary["mfcc_mean"], dtype=np.float32),
+        np.asarray(summary["mfcc_std"], dtype=np.float32),
+        [octave, np.sin(angle), np.cos(angle)],
+    ]).astype(np.float32)
+
+
+class SimilarityIndex:
+    """Cosine k-NN over a memory-mapped float32 matrix of sample embeddings.
+
+    Embeddings are z-scored with the library's own mean and spread, so no
+    feature group dominates, then L2-normalized, which makes a query one
+    matrix-vector product plus a partial sort. The matrix stays on disk and
+    is paged in by the OS.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.paths = meta["paths"]
+        self.mean = np.asarray(meta["mean"], dtype=np.float32)
+        self.std = np.asarray(meta["std"], dtype=np.float32)
+        shape = (len(self.paths), len(self.mean))
+        if self.paths:
+            self.embeddings = np.memmap(os.path.join(index_dir, "embeddings.f32"),
+                                        dtype=np.float32, mode="r", shape=shape)
+        else:
+            self.embeddings = np.zeros(shape, dtype=np.float32)
+        self._rows = {path: i for i, path in enumerate(self.paths)}
+
+    def __len__(self):
+        return len(self.paths)
+
+    @classmethod
+    def build(cls, summaries, index_dir=INDEX_DIR):
+        # summaries: {path: summary}; replaces any index already in index_dir
+        os.makedirs(index_dir, exist_ok=True)
+        paths = sorted(summaries)
+        raw = np.stack([embed(summaries[p]) for p in paths]) if paths \
+            else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        mean = raw.mean(axis=0) if paths else np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        std = raw.std(axis=0) if paths else np.ones(EMBEDDING_DIM, dtype=np.float32)
+        std[std < 1e-6] = 1.0
+
+        matrix_path = os.path.join(index_dir, "embeddings.f32")
+        tmp_path = f"{matrix_path}.{os.getpid()}.tmp"
+        _normalize((raw - mean) / std).tofile(tmp_path)
+        os.replace(tmp_path, matrix_path)
+
+        meta_path = os.path.join(index_dir, "meta.json")
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"paths": paths, "mean": mean.tolist(), "std": std.tolist()}, f)
+        os.replace(tmp_path, meta_path)
+        return cls(index_dir)
+
+    def project(self, summary):
+        return _normalize(((embed(summary) - self.mean) / self.std)[None])[0]
+
+    def query(self, vector, k=10, exclude=None):
+        # Top-k (path, cosine similarity) for a projected vector, best first.
+        # Exact search: at 100k x 53 this is a ~20 MB scan, a few ms.
+        if not self.paths:
+            return []
+        scores = np.asarray(self.embeddings @ vector)
+        if exclude is not None and exclude in self._rows:
+            scores[self._rows[exclude]] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.paths[i], float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+    def similar_to(self, file_path, k=10):
+        # Samples closest to an audio file, analyzing it first if needed
+        path = os.path.abspath(file_path)
+        if path in self._rows:
+            vector = np.array(self.embeddings[self._rows[path]])
+        else:
+            vector = self.project(summarize_file(file_path))
+        return self.query(vector, k, exclude=path)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def summarize_file(file_path):
+    import process_audio
+    return process_audio.summarize_result(process_audio.analyze_result(file_path))
+
+
+def build_library_index(root, index_dir=INDEX_DIR, workers=None, on_progress=None):
+    # Analyze (or read from cache) every file under root and index the results
+    from samplelab import analyze_library
+    results, errors = analyze_library(root, workers=workers, on_progress=on_progress)
+    summaries = {os.path.abspath(path): summary for path, summary in results.items()}
+    return SimilarityIndex.build(summaries, index_dir), errors
@@ -0,0 +1,169 @@
+import sys
+
+import librosa
+import numpy as np
+import soundfile as sf
+from scipy.signal import find_peaks
+
+from analysis_engine import estimate_key
+from key_detection import KEY_MAPPING, detect_key
+
+
+TEMPOGRAM_WIN = 384
+BEAT_SEGMENT = 60.0
+BEAT_OVERLAP = 8.0
+
+
+def stream_analyze(file_path, block_length=256, n_fft=2048, hop_length=512,
+                   n_mels=128, n_mfcc=13, keep_chroma=False, on_block=None):
+    """Block-wise onset, chroma, tempo and key for files too long to load.
+
+    Audio is read at its native rate through ``librosa.stream`` in blocks of
+    ``block_length`` frames. Consecutive blocks overlap by ``n_fft -
+    hop_length`` samples, so the frames come out the same as a
+    non-centered STFT over the whole file. Tempo comes from a tempogram
+    accumulated block by block and beats are tracked in overlapping
+    segments, so peak memory is one block plus one float32 of onset
+    strength per frame and one ``key_timeline`` entry per block, not the
+    decoded signal. The full chromagram (12 rows per frame) is only kept
+    with ``keep_chroma``; chroma and MFCC mean and deviation are always
+    accumulated.
+
+    ``on_block(frame_offset, running_key)`` is called after every block.
+    """
+    info = sf.info(file_path)
+    sr = info.samplerate
+    # The last block is zero-filled; frames past the end of the file are dropped
+    total_frames = max(1 + (info.frames - n_fft) // hop_length, 1)
+    mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    chroma_basis = librosa.filters.chroma(sr=sr, n_fft=n_fft)
+    window = librosa.filters.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+
+    onset_blocks = []
+    chroma_blocks = []
+    key_timeline = []
+    chroma_sum = np.zeros(12)
+    chroma_sq_sum = np.zeros(12)
+    mfcc_sum = np.zeros(n_mfcc)
+    mfcc_sq_sum = np.zeros(n_mfcc)
+    tempogram_sum = np.zeros(TEMPOGRAM_WIN)
+    tempogram_frames = 0
+    onset_tail = np.zeros(0, dtype=np.float32)
+    n_frames = 0
+    prev_mel = None
+
+    stream = librosa.stream(file_path, block_length=block_length, frame_length=n_fft,
+                            hop_length=hop_length, mono=True, fill_value=0)
+    for y_block in stream:
+        if len(y_block) < n_fft:
+            y_block = np.pad(y_block, (0, n_fft - len(y_block)))
+        # Frames of this block only; the overlap comes from librosa.stream
+        power = np.abs(librosa.stft(y_block, n_fft=n_fft, hop_length=hop_length,
+                                    window=window, center=False)) ** 2
+        power = power[:, :total_frames - n_frames]
+        if power.shape[1] == 0:
+            break
+
+        # --- Onset strength (spectral flux on log-mel, continued across blocks) ---
+        mel_db = librosa.power_to_db(mel_basis @ power, top_db=None)
+        previous = mel_db[:, :1] if prev_mel is None else prev_mel
+        flux = np.maximum(0.0, np.diff(np.hstack([previous, mel_db]), axis=1))
+        onset = flux.mean(axis=0).astype(np.float32)
+        onset_blocks.append(onset)
+        prev_mel = mel_db[:, -1:]
+        mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=n_mfcc)
+        mfcc_sum += mfcc.sum(axis=1)
+        mfcc_sq_sum += (mfcc ** 2).sum(axis=1)
+
+        # Tempogram columns for the new frames, with the previous window as context
+        context = np.concatenate([onset_tail, onset])
+        if len(context) >= TEMPOGRAM_WIN:
+            tg = librosa.feature.tempogram(onset_envelope=context, sr=sr, hop_length=hop_length,
+                                           win_length=TEMPOGRAM_WIN, center=False)
+            tempogram_sum += tg.sum(axis=1)
+            tempogram_frames += tg.shape[1]
+        onset_tail = context[-(TEMPOGRAM_WIN - 1):]
+
+        # --- Chroma and running key ---
+        chroma = librosa.util.normalize(chroma_basis @ power, axis=0)
+        chroma_sum += chroma.sum(axis=1)
+        chroma_sq_sum += (chroma ** 2).sum(axis=1)
+        if keep_chroma:
+            chroma_blocks.append(chroma.astype(np.float32))
+        n_frames += power.shape[1]
+        running_key = estimate_key((chroma_sum / n_frames)[:, None])
+        key_timeline.append((n_frames * hop_length / sr, running_key))
+
+        if on_block is not None:
+            on_block(n_frames, running_key)
+
+    onset_env = np.concatenate(onset_blocks) if onset_blocks else np.zeros(0, dtype=np.float32)
+    chroma_mean = chroma_sum / max(n_frames, 1)
+    chroma_std = np.sqrt(np.maximum(chroma_sq_sum / max(n_frames, 1) - chroma_mean ** 2, 0.0))
+    mfcc_mean = mfcc_sum / max(n_frames, 1)
+    mfcc_std = np.sqrt(np.maximum(mfcc_sq_sum / max(n_frames, 1) - mfcc_mean ** 2, 0.0))
+    key, _, key_confidence = detect_key(chroma_mean, min_strength=0.45)
+
+    # --- Tempo, beats and transients ---
+    tempo, beats = 0.0, np.zeros(0)
+    transients = np.zeros(0)
+    if tempogram_frames:
+        tg = (tempogram_sum / tempogram_frames)[:, None]
+        try:
+            tempo = float(librosa.feature.rhythm.tempo(tg=tg, sr=sr, hop_length=hop_length)[0])
+        except AttributeError:
+            tempo = float(librosa.beat.tempo(tg=tg, sr=sr, hop_length=hop_length)[0])
+        # Frames are not centered, so each time is offset by half a window
+        offset = n_fft / 2 / sr
+        beats = _segmented_beats(onset_env, sr, hop_length, tempo) + offset
+        peaks = find_peaks(onset_env, distance=32, prominence=0.5)[0]
+        transients = librosa.frames_to_time(peaks, sr=sr, hop_length=hop_length) + offset
+
+    return {
+        "sr": sr,
+        "hop_length": hop_length,
+        "duration": info.frames / sr,
+        "onset_envelope": onset_env,
+        "tempo": tempo,
+        "beats": beats,
+        "transients": transients,
+        "chroma": np.concatenate(chroma_blocks, axis=1) if chroma_blocks else None,
+        "chroma_mean": chroma_mean,
+        "chroma_std": chroma_std,
+        # Frame centres: frames are not centered, so half a window in
+        "times": librosa.frames_to_time(np.arange(n_frames), sr=sr, hop_length=hop_length)
+                 + n_fft / 2 / sr,
+        "mfcc_mean": mfcc_mean,
+        "mfcc_std": mfcc_std,
+        "key": key,
+        "key_confidence": key_confidence,
+        "key_timeline": key_timeline,
+    }
+
+
+def _segmented_beats(onset_env, sr, hop_length, tempo):
+    # Beat tracking memory grows with input length, so track overlapping
+    # segments at the global tempo and keep each segment's core
+    segment = int(BEAT_SEGMENT * sr / hop_length)
+    overlap = int(BEAT_OVERLAP * sr / hop_length)
+    beats = []
+    for start in range(0, len(onset_env), segment):
+        lo = max(start - overlap, 0)
+        hi = min(start + segment + overlap, len(onset_env))
+        _, frames = librosa.beat.beat_track(onset_envelope=onset_env[lo:hi], sr=sr,
+                                            hop_length=hop_length, bpm=tempo)
+        frames = frames + lo
+        beats.append(frames[(frames >= start) & (frames < start + segment)])
+    frames = np.concatenate(beats) if beats else np.zeros(0, dtype=int)
+
+    # Drop doubled beats where neighbouring segments disagree at the seam
+    min_gap = 0.5 * 60.0 / tempo * sr / hop_length
+    keep = np.concatenate([[True], np.diff(frames) >= min_gap]) if frames.size else frames.astype(bool)
+    return librosa.frames_to_time(frames[keep], sr=sr, hop_length=hop_length)
+
+
+if __name__ == "__main__":
+    result = stream_analyze(sys.argv[1])
+    print(f"Duration: {result['duration']:.1f} s")
+    print(f"Key: {result['key']}  (strongest pitch class {KEY_MAPPING[int(np.argmax(result['chroma_mean']))]})")
+    print(f"Tempo: {result['tempo']:.1f} BPM, {len(result['beats'])} beats, {len(result['transients'])} transients")
@@ -0,0 +1,98 @@
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+
+from visuals import chroma_grid_values, draw_chroma_grid
+
+
+class TimelinePlot:
+    """The waveform and chroma panels as artists that are built once and updated.
+
+    Axis styling, ticks and grids are set up here and never rebuilt. New
+    data goes into the existing artists (``set_verts``, ``set_segments``,
+    ``set_array``), so nothing is cleared between updates. Chop markers are
+    animated: the rest of the waveform axes is cached after every full draw,
+    and a chop change only restores that background, draws the markers and
+    blits the axes.
+    """
+
+    def __init__(self, ax, chord_ax, colors, chord_labels):
+        self.ax = ax
+        self.chord_ax = chord_ax
+        self.colors = colors
+        self.canvas = ax.figure.canvas
+
+        ax.set_ylim(-0.4, 0.2)
+        ax.grid(color=colors['grid'], alpha=0.3, linestyle=':')
+        chord_ax.set_yticks(np.arange(12))
+        chord_ax.set_yticklabels(reversed(chord_labels))
+        chord_ax.set_ylim(-0.5, 11.5)
+        chord_ax.grid(color=colors['grid'], alpha=0.3)
+
+        # Min/max envelope as one polygon, chop markers as one collection
+        self.wave = PolyCollection([], facecolors=colors['active'], edgecolors=colors['active'],
+                                   linewidths=0.8)
+        ax.add_collection(self.wave, autolim=False)
+        self.chops = LineCollection([], transform=ax.get_xaxis_transform(), alpha=0.8,
+                                    animated=True)
+        ax.add_collection(self.chops, autolim=False)
+        self.chroma_mesh = None
+        self.chroma_view = (0, 0)
+        self._background = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def set_waveform(self, t, lo, hi):
+        if len(t) == 0:
+            self.wave.set_verts([])
+            return
+        self.wave.set_verts([np.column_stack([np.concatenate([t, t[::-1]]),
+                                              np.concatenate([hi, lo[::-1]])])])
+
+    def set_chops(self, times, color, linestyle, visible=True):
+        times = np.asarray(times, dtype=np.float64)
+        segments = np.empty((times.size, 2, 2))
+        segments[:, :, 0] = times[:, None]
+        segments[:, :, 1] = (0, 1)
+        self.chops.set_segments(segments)
+        self.chops.set_color(color)
+        self.chops.set_linestyle(linestyle)
+        self.chops.set_visible(visible and times.size > 0)
+
+    def set_chroma(self, bins, bin_size, first, last, threshold, offset=0):
+        # The mesh spans only the visible bins, so it is rebuilt when the view
+        # moves; a threshold change alone goes through set_threshold.
+        # ``offset`` is the bin number of bins[:, 0] when they do not start at 0
+        if self.chroma_mesh is not None:
+            self.chroma_mesh.remove()
+            self.chroma_mesh = None
+        if bins is None:
+            return
+        self.chroma_view = (first, last)
+        self.chroma_mesh = draw_chroma_grid(self.chord_ax, bins[:, first:last], bin_size,
+                                            self.colors, threshold=threshold,
+                                            t_start=(first + offset) * bin_size)
+
+    def set_threshold(self, bins, threshold):
+        if self.chroma_mesh is None:
+            return False
+        first, last = self.chroma_view
+        self.chroma_mesh.set_array(chroma_grid_values(bins[:, first:last], threshold))
+        return True
+
+    def set_view(self, start, end):
+        self.ax.set_xlim(start, end)
+        self.chord_ax.set_xlim(start, end)
+
+    def blit_chops(self):
+        # Falls back to a full draw until a background has been cached
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.chops)
+        self.canvas.blit(self.ax.bbox)
+
+    def _on_draw(self, event):
+        # Animated artists are skipped by a full draw: cache what was drawn,
+        # then put the chop markers on top
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.chops)
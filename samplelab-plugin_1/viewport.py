@@ -0,0 +1,61 @@
+class Viewport:
+    """Visible time span over a track, with zoom and scroll clamped to it."""
+
+    def __init__(self, duration=0.0, span=10.0, min_span=0.05):
+        self.min_span = min_span
+        self.duration = 0.0
+        self.start = 0.0
+        self.span = span
+        self.set_duration(duration, span)
+
+    def set_duration(self, duration, span=None):
+        self.duration = max(float(duration), 0.0)
+        if span is not None:
+            self.span = span
+        self.start = 0.0
+        self._clamp()
+
+    @property
+    def end(self):
+        return self.start + self.span
+
+    @property
+    def bounds(self):
+        return self.start, self.end
+
+    def zoom(self, factor, anchor=None):
+        # factor < 1 zooms in; the anchor time stays under the cursor
+        if anchor is None:
+            anchor = self.start + self.span / 2
+        rel = (anchor - self.start) / self.span if self.span else 0.5
+        self.span *= factor
+        self._clamp_span()
+        self.start = anchor - rel * self.span
+        self._clamp()
+
+    def scroll(self, dt):
+        self.start += dt
+        self._clamp()
+
+    def scroll_to(self, start):
+        self.start = start
+        self._clamp()
+
+    def fit(self):
+        self.start = 0.0
+        self.span = self.duration or self.span
+        self._clamp()
+
+    def fractions(self):
+        # (first, last) of the visible span as fractions of the track, for scrollbars
+        if self.duration <= 0:
+            return 0.0, 1.0
+        return self.start / self.duration, min(self.end / self.duration, 1.0)
+
+    def _clamp_span(self):
+        upper = self.duration if self.duration > 0 else self.span
+        self.span = min(max(self.span, self.min_span), max(upper, self.min_span))
+
+    def _clamp(self):
+        self._clamp_span()
+        self.start = min(max(self.start, 0.0), max(self.duration - self.span, 0.0))
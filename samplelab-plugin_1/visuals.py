@@ -0,0 +1,41 @@
+import numpy as np
+from matplotlib.colors import ListedColormap
+
+
+def chroma_bin_means(chroma, times, bin_size=0.5, t_end=10):
+    # Mean of every pitch class over fixed-width time bins in one reduction.
+    # Bins without any frame come back as NaN.
+    n_bins = int(np.ceil(t_end / bin_size))
+    times = np.asarray(times)[:chroma.shape[1]]
+    keep = np.flatnonzero((times >= 0) & (times < t_end))
+    means = np.full((chroma.shape[0], n_bins), np.nan)
+    if keep.size == 0:
+        return means
+
+    bins = (times[keep] // bin_size).astype(int)
+    starts = np.flatnonzero(np.diff(bins, prepend=-1))
+    sums = np.add.reduceat(chroma[:, keep], starts, axis=1)
+    counts = np.diff(np.append(starts, bins.size))
+    means[:, bins[starts]] = sums / counts
+    return means
+
+
+def chroma_grid_values(means, threshold):
+    # Active/inactive cells with a masked spacer row between pitch classes
+    n_rows, n_bins = means.shape
+    grid = np.full((2 * n_rows - 1, n_bins), np.nan)
+    with np.errstate(invalid='ignore'):
+        grid[::2] = np.where(np.isnan(means), np.nan, means > threshold)
+    return np.ma.masked_invalid(grid)
+
+
+def draw_chroma_grid(ax, means, bin_size, colors, threshold=0.6, row_height=0.8, t_start=0.0):
+    # The whole pitch x time grid as a single QuadMesh artist
+    n_rows, n_bins = means.shape
+    x_edges = t_start + np.arange(n_bins + 1) * bin_size
+    y_edges = (np.arange(n_rows)[:, None] + np.array([-row_height / 2, row_height / 2])).ravel()
+    cmap = ListedColormap([colors['inactive'], colors['active']])
+    cmap.set_bad(alpha=0)
+    return ax.pcolormesh(x_edges, y_edges, chroma_grid_values(means, threshold),
+                         cmap=cmap, vmin=0, vmax=1,
+                         edgecolors=colors['background'], linewidth=0.5)
@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+import time
+
+from analysis_cache import CACHE_DIR
+
+JIT_CACHE_DIR = os.path.join(CACHE_DIR, "numba")
+# Long enough that the CQT's lowest octave still spans an FFT frame
+WARMUP_SECONDS = 4.0
+
+# Modules the GUI defers until after the window is up, in load order
+HEAVY_MODULES = ("scipy.signal", "librosa.core", "librosa.feature", "librosa.beat",
+                 "librosa.decompose", "librosa.effects", "soundfile", "midiutil")
+
+
+def configure_jit_cache(cache_dir=JIT_CACHE_DIR):
+    # numba reads NUMBA_CACHE_DIR once, on import, and librosa's kernels are
+    # compiled with cache=True, so this keeps them across runs even when
+    # site-packages is read-only. An explicit NUMBA_CACHE_DIR wins.
+    if "numba" not in sys.modules:
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ.setdefault("NUMBA_CACHE_DIR", cache_dir)
+    return os.environ.get("NUMBA_CACHE_DIR")
+
+
+def import_heavy_modules():
+    # Seconds per module; modules already imported cost (close to) nothing
+    import importlib
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def warm_up(tiers=None):
+    """Run every analysis stage once on a short synthetic loop.
+
+    This pays module imports, numba compilation (or loading from the
+    persistent cache) and FFT planning up front, so the first real file
+    analyzes as fast as later ones. Nothing is written to the analysis
+    cache. Returns ``{stage: seconds}``.
+    """
+    configure_jit_cache()
+    timings = {"imports": sum(import_heavy_modules().values())}
+
+    import librosa
+    import numpy as np
+    import quality
+    from analysis_engine import FeatureGraph
+    from create_test_samples import chord_loop
+
+    tiers = tiers or quality.TIER_NAMES
+    sr = max(quality.TIERS[tier]["sr"] for tier in tiers)
+    y = chord_loop(0, "Major", 120, bars=2, sr=sr)[:int(WARMUP_SECONDS * sr)].astype(np.float32)
+    for tier in tiers:
+        start = time.perf_counter()
+        tier_sr = quality.TIERS[tier]["sr"]
+        # Files are resampled to the tier rate on load, so warm that path too
+        tier_y = librosa.resample(y, orig_sr=sr, target_sr=tier_sr) if tier_sr != sr else y
+        graph = FeatureGraph(tier_y, tier_sr)
+        quality.rhythm(graph, tier)
+        quality.harmony(graph, tier)
+        graph.mfcc()
+        timings[tier] = time.perf_counter() - start
+    return timings
+
+
+def start_background(tiers=None, on_done=None):
+    # Daemon thread, so closing the window never waits on a warm-up
+    def run():
+        try:
+            timings = warm_up(tiers)
+        except Exception as e:
+            timings = {"error": f"{type(e).__name__}: {e}"}
+        if on_done:
+            on_done(timings)
+
+    configure_jit_cache()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _measure_cold_start(file_path, warm):
+    # Runs in a fresh interpreter: prints import, warm-up and two analysis timings as JSON
+    import json
+    import warnings
+    warnings.filterwarnings("ignore")
+    start = time.perf_counter()
+    import app  # noqa: F401
+    report = {"import_app": time.perf_counter() - start}
+    if warm:
+        report["warm_up"] = sum(v for v in warm_up().values())
+    import process_audio
+    from analysis_engine import clear_graphs, load_graph
+    # Both runs decode and analyze from scratch; the analysis cache is bypassed
+    for run in ("first_analysis", "second_analysis"):
+        clear_graphs()
+        start = time.perf_counter()
+        process_audio._analyze_graph(load_graph(file_path, **process_audio.DECODE_PARAMS))
+        report[run] = time.perf_counter() - start
+    print(json.dumps(report))
+
+
+def cold_start_report(file_path):
+    """Time a fresh process importing the GUI and analyzing ``file_path``
+    twice, without and with a warm-up first. The numba cache is shared
+    between the runs, as it would be between launches.
+    """
+    import json
+    import subprocess
+    import tempfile
+    reports = {}
+    for warm in (False, True):
+        with tempfile.TemporaryDirectory(prefix="samplelab-warmup-") as cache_dir:
+            env = dict(os.environ, MPLBACKEND="Agg", SAMPLELAB_CACHE_DIR=cache_dir,
+                       NUMBA_CACHE_DIR=configure_jit_cache())
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "_measure", os.path.abspath(file_path),
+                 "1" if warm else "0"],
+                capture_output=True, text=True, env=env, check=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+        reports["warm" if warm else "cold"] = json.loads(proc.stdout.strip().splitlines()[-1])
+    return reports
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["_measure"]:
+        _measure_cold_start(sys.argv[2], sys.argv[3] == "1")
+    elif len(sys.argv) > 1:
+        for name, report in cold_start_report(sys.argv[1]).items():
+            print(f"{name}: " + "  ".join(f"{stage} {seconds:.3f} s" for stage, seconds in report.items()))
+    else:
+        for stage, seconds in warm_up().items():
+            print(f"{stage:<10} {seconds:>7.3f} s")
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+BASE_BLOCK = 16
+FACTOR = 4
+
+
+class PeakPyramid:
+    """Multi-resolution min/max peaks of a mono signal, like a DAW peak file.
+
+    Level 0 holds the min and max of every ``BASE_BLOCK`` samples and each
+    further level merges ``FACTOR`` blocks of the one below. Renderers ask
+    for a time window at a given pixel width and get one min/max pair per
+    pixel, read from the coarsest level that still resolves it, so drawing
+    cost follows the screen width rather than the sample count.
+    """
+
+    def __init__(self, mins, maxs, sr, n_samples, base_block=BASE_BLOCK, factor=FACTOR, y=None):
+        self.mins = mins
+        self.maxs = maxs
+        self.sr = sr
+        self.n_samples = n_samples
+        self.base_block = base_block
+        self.factor = factor
+        # Raw samples, used when zoomed in past level 0
+        self.y = y
+
+    @classmethod
+    def build(cls, y, sr, base_block=BASE_BLOCK, factor=FACTOR):
+        y = np.asarray(y, dtype=np.float32)
+        if y.size == 0:
+            y = np.zeros(1, dtype=np.float32)
+        mins, maxs = [], []
+        lo, hi = _block_reduce(y, y, base_block)
+        while True:
+            mins.append(lo)
+            maxs.append(hi)
+            if lo.size <= factor:
+                break
+            lo, hi = _block_reduce(lo, hi, factor)
+        return cls(mins, maxs, sr, len(y), base_block, factor, y=y)
+
+    @property
+    def duration(self):
+        return self.n_samples / self.sr
+
+    def block_size(self, level):
+        return self.base_block * self.factor ** level
+
+    def level_for(self, samples_per_pixel):
+        # Coarsest level with at least one block per pixel; -1 means raw samples
+        level = -1
+        while level + 1 < len(self.mins) and self.block_size(level + 1) <= samples_per_pixel:
+            level += 1
+        return level
+
+    def window(self, t_start, t_end, n_pixels):
+        # Returns (times, mins, maxs) with at most n_pixels columns
+        n_pixels = max(int(n_pixels), 1)
+        start = min(max(int(t_start * self.sr), 0), self.n_samples)
+        stop = min(max(int(np.ceil(t_end * self.sr)), start), self.n_samples)
+        if stop <= start:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty, empty
+
+        level = self.level_for((stop - start) / n_pixels)
+        if level < 0 and self.y is None:
+            level = 0
+        if level < 0:
+            lo = hi = self.y[start:stop]
+            block, first = 1, start
+        else:
+            block = self.block_size(level)
+            first, last = start // block, -(-stop // block)
+            lo = self.mins[level][first:last]
+            hi = self.maxs[level][first:last]
+            first *= block
+
+        # Fold what is left down to exactly one column per pixel
+        if lo.size > n_pixels:
+            edges = np.linspace(0, lo.size, n_pixels + 1).astype(int)
+            lo = np.minimum.reduceat(lo, edges[:-1])
+            hi = np.maximum.reduceat(hi, edges[:-1])
+            centers = first + (edges[:-1] + edges[1:]) / 2 * block
+        else:
+            centers = first + (np.arange(lo.size) + 0.5) * block
+        return centers / self.sr, lo, hi
+
+    def save(self, path, source_stat=None):
+        arrays = {}
+        for i, (lo, hi) in enumerate(zip(self.mins, self.maxs)):
+            arrays[f"min_{i}"] = lo
+            arrays[f"max_{i}"] = hi
+        meta = np.array([self.sr, self.n_samples, self.base_block, self.factor, len(self.mins),
+                         source_stat.st_size if source_stat else -1,
+                         source_stat.st_mtime_ns if source_stat else -1], dtype=np.int64)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=meta, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source_stat=None):
+        with np.load(path, allow_pickle=False) as data:
+            sr, n_samples, base_block, factor, n_levels, size, mtime_ns = data["meta"].tolist()
+            if source_stat is not None and (size, mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+                return None
+            mins = [data[f"min_{i}"] for i in range(n_levels)]
+            maxs = [data[f"max_{i}"] for i in range(n_levels)]
+        return cls(mins, maxs, sr, n_samples, base_block, factor)
+
+
+def _block_reduce(lo, hi, block):
+    # Min of lo and max of hi over consecutive blocks, padding with edge values
+    pad = -len(lo) % block
+    if pad:
+        lo = np.concatenate([lo, np.full(pad, lo[-1], dtype=lo.dtype)])
+        hi = np.concatenate([hi, np.full(pad, hi[-1], dtype=hi.dtype)])
+    return lo.reshape(-1, block).min(axis=1), hi.reshape(-1, block).max(axis=1)
+
+
+def peaks_path(audio_path):
+    return f"{audio_path}.peaks.npz"
+
+
+def load_peaks(audio_path, sr):
+    # Peak file next to the audio, or None if missing or stale
+    try:
+        pyramid = PeakPyramid.load(peaks_path(audio_path), os.stat(audio_path))
+    except (OSError, KeyError, ValueError):
+        return None
+    if pyramid is None or pyramid.sr != sr:
+        return None
+    return pyramid
+
+
+def load_or_build(audio_path, y, sr):
+    # Reuse the peak file next to the audio if it matches, otherwise rebuild it
+    pyramid = load_peaks(audio_path, sr)
+    if pyramid is not None and pyramid.n_samples == len(y):
+        pyramid.y = np.asarray(y, dtype=np.float32)
+        return pyramid
+
+    pyramid = PeakPyramid.build(y, sr)
+    try:
+        pyramid.save(peaks_path(audio_path), os.stat(audio_path))
+    except OSError:
+        # Read-only sample folders still get an in-memory pyramid
+        pass
+    return pyramid